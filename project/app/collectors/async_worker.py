@@ -0,0 +1,113 @@
+import asyncio
+import signal
+import traceback
+from typing import Any, Dict, Optional, Set
+
+from ..db import serialization
+from ..db.async_mongo import close_db_client
+from ..db.indexes import setup_indexes
+from ..db.mongo import get_db_conn
+from ..db.redis import get_db, get_async_db, close_shared_async_db
+from .hydration_pool import shutdown_hydration_executor
+from .requester.session_pool import close_shared_sessions
+from .utils import read_yaml
+
+# Redis list the jobs of the asyncio worker are queued to
+ASYNC_JOBS_QUEUE = 'async_worker:jobs'
+
+# seconds BLPOP waits for a job, before the worker checks whether it has to stop
+POP_TIMEOUT = 5
+
+
+def enqueue_job(collector_type: str, job_data_dict: Optional[Dict[str, Any]] = None):
+    get_db().rpush(ASYNC_JOBS_QUEUE, serialization.dumps({
+        "collector_type": collector_type,
+        "job_data": job_data_dict,
+    }))
+
+
+class AsyncWorker():
+    """
+    Runs jobs popped from ASYNC_JOBS_QUEUE as coroutines of a single event loop,
+    not more than `concurrency` of them at a time
+    """
+
+    def __init__(self, concurrency: int):
+        self.__concurrency = concurrency
+        self.__stopping = asyncio.Event()
+        self.__jobs: Set[asyncio.Task] = set()
+
+    def stop(self):
+        """
+        No more jobs are popped, the running ones are awaited
+        """
+        self.__stopping.set()
+
+    async def run(self):
+        db = get_async_db()
+        semaphore = asyncio.Semaphore(self.__concurrency)
+
+        try:
+            while not self.__stopping.is_set():
+                # the job is popped only when there's a slot to run it,
+                # so the rest stay in the queue for the other workers
+                await semaphore.acquire()
+                if self.__stopping.is_set():
+                    semaphore.release()
+                    break
+
+                popped = await db.blpop([ASYNC_JOBS_QUEUE], timeout=POP_TIMEOUT)
+                if popped is None:
+                    semaphore.release()
+                    continue
+
+                job = asyncio.create_task(self.__run_job(popped[1], semaphore))
+                self.__jobs.add(job)
+                job.add_done_callback(self.__jobs.discard)
+
+        finally:
+            if self.__jobs:
+                print(f"Waiting for {len(self.__jobs)} running jobs")
+                await asyncio.gather(*self.__jobs, return_exceptions=True)
+
+            await db.aclose()
+            await close_shared_sessions()
+            await close_shared_async_db()
+            close_db_client()
+
+    async def __run_job(self, message: bytes, semaphore: asyncio.Semaphore):
+        # including with lazy to avoid dependency chain
+        from .worker import async_run_job
+
+        try:
+            job = serialization.loads(message)
+            await async_run_job(job["collector_type"], job.get("job_data"))
+        except Exception as e:
+            print(f"Failed to run job {message}: {e}")
+            traceback.print_exc()
+        finally:
+            semaphore.release()
+
+
+async def main():
+    config = read_yaml()
+    concurrency = config.get('async_worker_concurrency', 100)
+    print(f"Starting asyncio worker with async_worker_concurrency={concurrency}, json backend={serialization.get_backend_name()}")
+
+    setup_indexes(get_db_conn())
+
+    worker = AsyncWorker(concurrency)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await worker.run()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        # waits for hydration processes, so it's done once the event loop is gone
+        shutdown_hydration_executor()
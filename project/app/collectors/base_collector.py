@@ -1,20 +1,44 @@
 from abc import ABC, abstractmethod
+import asyncio
+import time
+import uuid
 import yaml
-from datetime import datetime
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 from .requester import BaseRequester, NoAuthRequester, BasicAuthRequester, TokenAuthRequester, TokenBearerAuthRequester, OAuthRequester
+from .requester import RetryPolicy, HttpConfig
 from ..db.async_mongo import fix_dt_for_db
 from .hydrated.base_collection import BaseHydratedCollection
+from .hydrated.write_buffer import WriteBuffer
+from .sync_state import SyncState, LeaseLostException
+from .hydration_pool import get_hydration_executor, hydrate_in_process
+
+
+# incremental runs request a bit more than changed since the watermark,
+# so hosts updated while the previous run was finishing are not missed
+WATERMARK_OVERLAP = timedelta(minutes=5)
 
 
 class BaseCollector(ABC):
-    def __init__(self, config, rate_limit_data: Dict[str, Any] = None):
+    def __init__(self, config, rate_limit_data: Dict[str, Any] = None, sync_data: Dict[str, Any] = None):
+        if config.get('stream_items_path') is not None and not self._supports_streamed_pages():
+            raise ValueError(
+                self._get_class_name() + " doesn't support 'stream_items_path': its _paginate() needs raw_data"
+            )
+
         self.config = config
 
         self.__rate_limit_data = rate_limit_data if rate_limit_data is not None else {}
         self.__requester = None
+        self.__write_buffer = None
+
+        # run_id & since (None - full sync) of the run the job belongs to
+        self.__sync_data = dict(sync_data) if sync_data is not None else {}
+        self.__sync_state = None
+        self.__watermark: Optional[datetime] = None
 
         base_config_path = Path(__file__).parent / 'config.yaml'
         with open(base_config_path, 'r') as f:
@@ -35,6 +59,69 @@ class BaseCollector(ABC):
 
         return timeout
 
+    def _get_pages_per_job(self) -> int:
+        return self.config.get('pages_per_job') or self._base_config.get('pages_per_job', 1)
+
+    def _get_job_time_slice(self) -> int:
+        """
+        Returns max seconds a single job may spend on fetching pages, 0 - no limit
+        """
+        return self.config.get('job_time_slice') or self._base_config.get('job_time_slice', 0)
+
+    def _get_prefetch_pages(self) -> int:
+        """
+        Returns max number of fetched pages waiting to be saved, 0 - no prefetch
+        """
+        return self.config.get('prefetch_pages') or self._base_config.get('prefetch_pages', 0)
+
+    def _get_fan_out(self) -> int:
+        """
+        Returns number of offset windows fetched concurrently, 0 - no fan-out
+        """
+        return self.config.get('fan_out') or self._base_config.get('fan_out', 0)
+
+    def _get_write_buffer_size(self) -> int:
+        """
+        Returns number of write operations buffered across pages before flush, 0 - no buffering
+        """
+        return self.config.get('write_buffer_size') or self._base_config.get('write_buffer_size', 0)
+
+    def _get_write_buffer_max_delay(self) -> int:
+        return self.config.get('write_buffer_max_delay') or self._base_config.get('write_buffer_max_delay', 0)
+
+    def _get_stream_items_path(self) -> Optional[str]:
+        """
+        Returns ijson prefix of the items in JSON response (e.g. `item` for top level array),
+        None - response is not streamed
+        """
+        return self.config.get('stream_items_path')
+
+    def _supports_streamed_pages(self) -> bool:
+        """
+        Streamed pages are hydrated from the items only, so `_paginate()` receives raw_data=None.
+        Collectors, which paginate by request_params & hydrated_collection only, should override it to allow stream_items_path
+        """
+        return False
+
+    def _get_stream_chunk_size(self) -> int:
+        """
+        Returns number of streamed items hydrated at once
+        """
+        return self.config.get('stream_chunk_size') or self._base_config.get('stream_chunk_size', 500)
+
+    def _get_hydration_processes(self) -> int:
+        """
+        Returns number of processes pages are hydrated in, 0 - pages are hydrated in the event loop
+        """
+        return self.config.get('hydration_processes') or self._base_config.get('hydration_processes', 0)
+
+    def _get_lease_ttl(self) -> int:
+        """
+        Returns seconds the vendor's lease is kept without being prolonged,
+        it has to cover waiting of the run's next job in the queue
+        """
+        return self.config.get('lease_ttl') or self._base_config.get('lease_ttl', 600)
+
     def _get_http_method(self) -> str:
         return self.config.get('http_method', 'GET')
 
@@ -81,13 +168,35 @@ class BaseCollector(ABC):
     def _get_dedup_before_insert(self) -> bool:
         return self.config.get('dedup_before_insert', 0) > 0
 
+    def _get_skip_unchanged(self) -> bool:
+        return self.config.get('skip_unchanged', 0) > 0
+
+    def _get_incremental(self) -> bool:
+        return self.config.get('incremental', 0) > 0
+
+    def _get_full_resync_interval(self) -> int:
+        """
+        Returns minutes between full syncs of incremental collector
+        """
+        return self.config.get('full_resync_interval') or self._base_config.get('full_resync_interval', 1440)
+
     @abstractmethod
     def _hydrate_request_params(self, data: Dict) -> Dict:
         """
-        Returns hydrated dict of params for request
+        Returns hydrated dict of params for request.
+
+        data['since'] is set for incremental runs only,
+        collectors supporting it should request entities changed since that datetime
         """
         pass
 
+    def _get_volatile_raw_fields(self) -> Tuple[str, ...]:
+        """
+        Returns dotted paths of raw_data fields changing on every poll (e.g. vendor's last seen),
+        they are left out of entities' fingerprints, so unchanged hosts are detected by skip_unchanged
+        """
+        return ()
+
     @abstractmethod
     def _hydrate(self, raw_data: Dict) -> BaseHydratedCollection:
         """
@@ -96,15 +205,178 @@ class BaseCollector(ABC):
         pass
 
     @abstractmethod
-    def _paginate(self, request_params: Dict, raw_data: Dict) -> Dict:
+    def _paginate(self, request_params: Dict, raw_data: Dict, hydrated_collection: BaseHydratedCollection) -> Dict:
         """
         Returns Dictionary containing next_page_request_params.
+
+        hydrated_collection is the already hydrated raw_data (before dedup), use it instead of hydrating again.
+        raw_data is None if the response is streamed (stream_items_path),
+        which is allowed only for collectors with _supports_streamed_pages()
         """
         pass
 
+    def _get_request_offset(self, request_params: Dict) -> Optional[int]:
+        """
+        Returns offset of hydrated request params.
+
+        Offset paginated collectors should override it,
+        None means pages can't be addressed by offset, thus there's no fan-out
+        """
+        return None
+
     def _get_class_name(self) -> str:
         return self.__class__.__name__
 
+    def _get_initial_request_params(self) -> Optional[Dict]:
+        return self.__hydrate_offset_request_params(self._get_limit(), 0)
+
+    def __hydrate_offset_request_params(self, limit: int, offset: int) -> Optional[Dict]:
+        return self._hydrate_request_params({
+            'limit': limit,
+            'offset': offset,
+            'since': self._get_since(),
+        })
+
+    def _get_sync_state(self) -> SyncState:
+        if self.__sync_state is None:
+            self.__sync_state = SyncState(self._get_vendor_name())
+
+        return self.__sync_state
+
+    async def acquire_lease(self, lease_id: str) -> bool:
+        """
+        Takes (or prolongs) the vendor's lease
+
+        Returns False if another run of the vendor holds it
+        """
+        return await self._get_sync_state().acquire_lease(lease_id, self._get_lease_ttl())
+
+    async def keep_lease(self, lease_id: str):
+        """
+        Prolongs the lease while the job is running, has to be cancelled when the job is done
+
+        Raises LeaseLostException if another run took the lease,
+        or it couldn't be prolonged (e.g. Redis is down) before expiry
+        """
+        interval = self._get_lease_ttl() / 3
+        prolonged_at = time.monotonic()
+
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                is_acquired = await self.acquire_lease(lease_id)
+            except Exception as e:
+                # the next attempt would be too late
+                if time.monotonic() - prolonged_at + interval >= self._get_lease_ttl():
+                    raise LeaseLostException(f"Failed to prolong lease of {self._get_vendor_name()} before expiry: {e}")
+
+                print(f"\tFailed to prolong lease of {self._get_vendor_name()}, retrying: {e}")
+                continue
+
+            if not is_acquired:
+                raise LeaseLostException(f"Lease of {self._get_vendor_name()} is taken by another run")
+
+            prolonged_at = time.monotonic()
+
+    async def release_lease(self, lease_id: str):
+        await self._get_sync_state().release_lease(lease_id)
+
+    async def start_sync(self, hydrated_request_params: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Starts a new run, unless the job continues one.
+        If the vendor's previous run was interrupted, it's resumed from its checkpoint instead.
+        Run is incremental if there is a watermark & full_resync_interval hasn't passed since the last full sync
+
+        Returns request params the job has to start with
+        """
+        if self.__sync_data.get('run_id') is not None:
+            return hydrated_request_params
+
+        checkpoint = await self._get_sync_state().get_checkpoint()
+        if checkpoint is not None:
+            print(f"\tResuming run {checkpoint['sync_data']['run_id']} from checkpoint: {checkpoint['request_params']}")
+
+            self.__sync_data = checkpoint['sync_data']
+            if self.__requester is None and checkpoint.get('rate_limit_data'):
+                self.__rate_limit_data = checkpoint['rate_limit_data']
+
+            return checkpoint['request_params']
+
+        since = None
+        if self._get_incremental():
+            since = await self.__get_incremental_since()
+
+        self.__sync_data = {
+            'run_id': uuid.uuid4().hex,
+            'since': since.isoformat() if since is not None else None,
+        }
+
+        return hydrated_request_params
+
+    async def __get_incremental_since(self) -> Optional[datetime]:
+        sync_state = self._get_sync_state()
+
+        watermark = await sync_state.get_watermark()
+        if watermark is None:
+            return None
+
+        last_full_sync_at = await sync_state.get_last_full_sync_at()
+        if last_full_sync_at is None or \
+                datetime.now(timezone.utc) - last_full_sync_at >= timedelta(minutes=self._get_full_resync_interval()):
+            return None
+
+        return watermark - WATERMARK_OVERLAP
+
+    def get_sync_data(self) -> Dict[str, Any]:
+        """
+        Returns run's data to be passed to the next job of the run
+        """
+        return dict(self.__sync_data)
+
+    def _get_since(self) -> Optional[datetime]:
+        since = self.__sync_data.get('since')
+
+        return datetime.fromisoformat(since) if since else None
+
+    async def finish_sync(self):
+        """
+        Drops checkpoint & commits watermark of the run, has to be called once all the pages of the run are fetched
+        """
+        if self.__sync_data.get('run_id') is None:
+            return
+
+        await self._get_sync_state().clear_checkpoint()
+
+        if self._get_incremental():
+            await self._get_sync_state().commit_run(self.__sync_data['run_id'], self._get_since() is None)
+
+    async def _save_checkpoint(self, next_page_params: Optional[Dict]):
+        """
+        Saves the run's position, unless some of the pages before next_page_params are still in the write buffer
+        """
+        if next_page_params is None or self.__sync_data.get('run_id') is None:
+            return
+
+        if self.__write_buffer is not None and self.__write_buffer.len():
+            return
+
+        await self._get_sync_state().save_checkpoint({
+            'sync_data': self.get_sync_data(),
+            'request_params': next_page_params,
+            'rate_limit_data': self.get_rate_limiter_data(),
+        })
+
+    async def __save_watermark(self):
+        """
+        Saves max watermark of the job's pages (they are in DB already) into the run's one
+        """
+        if not self._get_incremental() or self.__watermark is None or self.__sync_data.get('run_id') is None:
+            return
+
+        await self._get_sync_state().raise_run_watermark(self.__sync_data['run_id'], self.__watermark)
+        self.__watermark = None
+
     async def fetch_data(self, hydrated_request_params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Fetch data and return next_page_request_params.
@@ -113,31 +385,312 @@ class BaseCollector(ABC):
             Dictionary containing next_page_request_params.
         """
         if hydrated_request_params is None:
-            hydrated_request_params = self._hydrate_request_params({
-                'limit': self._get_limit(),
-                'offset': 0,
-            })
+            hydrated_request_params = self._get_initial_request_params()
 
-        return await self._request_data(hydrated_request_params)
+        try:
+            next_page_params = await self._request_data(hydrated_request_params)
+        except BaseException:
+            await self.__flush_writes_after_failure()
+            raise
 
-    async def _request_data(self, request_params: Dict) -> Dict:
+        await self.flush_writes()
+
+        await self.__save_watermark()
+        await self._save_checkpoint(next_page_params)
+
+        return next_page_params
+
+    async def fetch_pages(self, hydrated_request_params: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
         """
-        Makes a request to vendor api and saves the result
+        Fetch pages one after another with the same requester,
+        until there are no more pages or pages_per_job|job_time_slice budget is exhausted.
 
-        Returns Dictionary containing next_page_request_params.
+        Returns:
+            Dictionary containing next_page_request_params,
+            None if all the pages were fetched.
+        """
+        pages_left = self._get_pages_per_job()
+        time_slice = self._get_job_time_slice()
+        deadline = time.monotonic() + time_slice if time_slice else None
+
+        try:
+            next_page_params = await self._request_pages(hydrated_request_params, pages_left, deadline)
+        except BaseException:
+            await self.__flush_writes_after_failure()
+            raise
+
+        await self.flush_writes()
+
+        await self.__save_watermark()
+        await self._save_checkpoint(next_page_params)
+
+        return next_page_params
+
+    async def flush_writes(self):
+        """
+        Writes everything buffered by the write buffer
+        """
+        if self.__write_buffer is not None:
+            await self.__write_buffer.flush()
+
+    async def __flush_writes_after_failure(self):
+        # pages saved before the failure are still written, but a flush error doesn't replace the original one
+        try:
+            await self.flush_writes()
+        except Exception as err:
+            print(f"\tFailed to flush writes of the failed job: {err}")
+
+    def _get_write_buffer(self) -> Optional[WriteBuffer]:
+        if self.__write_buffer is None and self._get_write_buffer_size() > 0:
+            self.__write_buffer = WriteBuffer(self._get_write_buffer_size(), self._get_write_buffer_max_delay())
+
+        return self.__write_buffer
+
+    async def _request_pages(
+        self, hydrated_request_params: Optional[Dict], pages_left: int, deadline: Optional[float]
+    ) -> Optional[Dict[str, Any]]:
+        if hydrated_request_params is None:
+            hydrated_request_params = self._get_initial_request_params()
+
+        if self._get_fan_out() > 1 and self._get_request_offset(hydrated_request_params) is not None:
+            return await self._request_data_fan_out(hydrated_request_params, pages_left, deadline)
+
+        if self._get_prefetch_pages() > 0:
+            return await self._request_data_pipelined(hydrated_request_params, pages_left, deadline)
+
+        next_page_params = await self._request_data(hydrated_request_params)
+        pages_left -= 1
+
+        while next_page_params is not None and pages_left > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+            await self._save_checkpoint(next_page_params)
+
+            next_page_params = await self._request_data(next_page_params)
+            pages_left -= 1
+
+        return next_page_params
+
+    async def _fetch_page(self, request_params: Dict) -> Optional[Tuple[BaseHydratedCollection, Optional[Dict]]]:
+        """
+        Makes a request to vendor api and hydrates the result
+
+        Returns hydrated collection & next_page_request_params,
+        None if there is no data.
+        """
+        if self._get_stream_items_path() is not None:
+            raw_data = None
+            hydratedCollection = await self.__fetch_streamed_page(request_params)
+            if hydratedCollection is None:
+                return None
+        else:
+            raw_data = await self._get_requester().request(
+                self.config['endpoint'],
+                self.config.get('http_method', 'GET'),
+                request_params,
+            )
+            if not raw_data:
+                return None
+
+            hydratedCollection = await self._hydrate_async(raw_data)
+
+        hydratedCollection.use_write_buffer(self._get_write_buffer())
+
+        # some collectors build the next params in place,
+        # a copy keeps params of pages waiting to be saved untouched
+        return hydratedCollection, self._paginate(dict(request_params), raw_data, hydratedCollection)
+
+    async def _hydrate_async(self, raw_data: Any) -> BaseHydratedCollection:
+        """
+        Hydrates raw_data in the process pool if hydration_processes is set,
+        so large pages don't block the event loop
+        """
+        hydration_processes = self._get_hydration_processes()
+        if not hydration_processes:
+            return self._hydrate(raw_data)
+
+        return await asyncio.get_running_loop().run_in_executor(
+            get_hydration_executor(hydration_processes),
+            hydrate_in_process,
+            self._get_vendor_name(), raw_data
+        )
+
+    async def __fetch_streamed_page(self, request_params: Dict) -> Optional[BaseHydratedCollection]:
+        """
+        Hydrates items in chunks while the response is being downloaded,
+        so the whole page is never kept as raw JSON
+
+        Returns None if there are no items
         """
-        raw_data = await self._get_requester().request(
+        hydratedCollection = None
+        chunk = []
+
+        # closed right away if hydration fails, so is the response with its connection
+        async with aclosing(self._get_requester().request_stream(
             self.config['endpoint'],
             self.config.get('http_method', 'GET'),
             request_params,
-        )
-        if not raw_data:
+            self._get_stream_items_path()
+        )) as items:
+            async for item in items:
+                chunk.append(item)
+                if len(chunk) < self._get_stream_chunk_size():
+                    continue
+
+                hydratedCollection = await self.__merge_hydrated_chunk(hydratedCollection, chunk)
+                chunk = []
+
+        if chunk:
+            hydratedCollection = await self.__merge_hydrated_chunk(hydratedCollection, chunk)
+
+        return hydratedCollection
+
+    async def __merge_hydrated_chunk(
+        self, hydrated_collection: Optional[BaseHydratedCollection], chunk: List[Any]
+    ) -> BaseHydratedCollection:
+        chunk_collection = await self._hydrate_async(chunk)
+        if hydrated_collection is None:
+            return chunk_collection
+
+        hydrated_collection.merge(chunk_collection)
+
+        return hydrated_collection
+
+    async def _request_data(self, request_params: Dict) -> Dict:
+        """
+        Makes a request to vendor api and saves the result
+
+        Returns Dictionary containing next_page_request_params.
+        """
+        page = await self._fetch_page(request_params)
+        if page is None:
             return None
 
-        hydratedCollection = self._hydrate(raw_data)
-        await hydratedCollection.save_to_db()
+        hydratedCollection, next_page_params = page
+        await self._save_page(hydratedCollection)
+
+        return next_page_params
+
+    async def _save_page(self, hydrated_collection: BaseHydratedCollection):
+        # save_to_db() drops duplicated & unchanged entities, so watermark is taken before
+        watermark = hydrated_collection.get_watermark()
+
+        await hydrated_collection.save_to_db()
+
+        if watermark is not None and (self.__watermark is None or watermark > self.__watermark):
+            self.__watermark = watermark
+
+    async def _request_data_fan_out(
+        self, request_params: Dict, pages_limit: int, deadline: Optional[float]
+    ) -> Optional[Dict]:
+        """
+        Requests fan_out offset windows concurrently (rate limit is kept by the requester),
+        until a short page is seen.
+
+        Returns Dictionary containing next_page_request_params.
+        """
+        limit = self._get_limit()
+        offset = self._get_request_offset(request_params)
+
+        pages_done = 0
+        while pages_done < pages_limit:
+            if pages_done and deadline is not None and time.monotonic() >= deadline:
+                break
 
-        return self._paginate(request_params, raw_data)
+            windows = min(self._get_fan_out(), pages_limit - pages_done)
+            tasks = [
+                asyncio.create_task(self.__request_window(offset + window * limit, limit)) for window in range(windows)
+            ]
+            try:
+                windows_full = await asyncio.gather(*tasks)
+            except BaseException:
+                # the other windows mustn't keep requesting & saving, while the job is torn down
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+                raise
+
+            pages_done += windows
+            offset += windows * limit
+
+            if not all(windows_full):
+                return None
+
+            # windows are saved in any order, so only the whole round moves the checkpoint
+            await self._save_checkpoint(self.__hydrate_offset_request_params(limit, offset))
+
+        return self.__hydrate_offset_request_params(limit, offset)
+
+    async def __request_window(self, offset: int, limit: int) -> bool:
+        """
+        Fetches & saves a single offset window
+
+        Returns True if there might be more pages after it
+        """
+        next_page_params = await self._request_data(self.__hydrate_offset_request_params(limit, offset))
+
+        return next_page_params is not None
+
+    async def _request_data_pipelined(
+        self, request_params: Dict, pages_limit: int, deadline: Optional[float]
+    ) -> Optional[Dict]:
+        """
+        Requests the next page as soon as its params are known,
+        while the previous pages are being saved.
+        Not more than prefetch_pages pages are waiting to be saved.
+
+        Returns Dictionary containing next_page_request_params.
+        """
+        pages_queue: asyncio.Queue = asyncio.Queue(maxsize=self._get_prefetch_pages())
+        producer = asyncio.create_task(
+            self.__produce_pages(pages_queue, request_params, pages_limit, deadline)
+        )
+
+        try:
+            while (page := await pages_queue.get()) is not None:
+                hydratedCollection, next_page_params = page
+                await self._save_page(hydratedCollection)
+                await self._save_checkpoint(next_page_params)
+        except BaseException:
+            producer.cancel()
+            raise
+
+        return await producer
+
+    async def __produce_pages(
+        self, pages_queue: asyncio.Queue, request_params: Dict, pages_limit: int, deadline: Optional[float]
+    ) -> Optional[Dict]:
+        next_page_params = request_params
+
+        try:
+            for page_num in range(pages_limit):
+                if page_num and deadline is not None and time.monotonic() >= deadline:
+                    break
+
+                page = await self._fetch_page(next_page_params)
+                if page is None:
+                    next_page_params = None
+                    break
+
+                next_page_params = page[1]
+                await pages_queue.put(page)
+
+                if next_page_params is None:
+                    break
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception:
+            # letting consumer know there is nothing more to save
+            await pages_queue.put(None)
+            raise
+
+        await pages_queue.put(None)
+
+        return next_page_params
 
     def _normalize_dt(self, dt_str: str) -> Optional[datetime]:
         return fix_dt_for_db(dt_str)
@@ -162,6 +715,18 @@ class BaseCollector(ABC):
 
         return config
 
+    def _create_retry_policy(self) -> RetryPolicy:
+        """
+        Returns RetryPolicy hydrated from `retry` config, defaults are used for missing keys
+        """
+        return RetryPolicy(**self.config.get("retry", {}))
+
+    def _create_http_config(self) -> HttpConfig:
+        """
+        Returns HttpConfig hydrated from `http` config, defaults are used for missing keys
+        """
+        return HttpConfig(**self.config.get("http", {}))
+
     def get_rate_limiter_data(self) -> Dict[str, Any]:
         """
         Returns RateLimiter data (config + requests_done, started_at)
@@ -241,13 +806,25 @@ class BaseCollector(ABC):
                         self._create_rate_limiter_config(),
                         token_url,
                         client_id, client_secret,
-                        self.config.get('scope')
+                        self.config.get('scope'),
+                        self.config.get('token_storage', 'local')
                     )
 
                 case _:
                     self.__requester = self._get_custom_requester()
 
+            self.__requester.set_retry_policy(self._create_retry_policy())
+            self.__requester.set_http_config(self._create_http_config())
+            # keep-alive connections are reused by all the jobs of the event loop
+            self.__requester.use_shared_session(self._get_vendor_name())
+
         return self.__requester
 
     async def close_requester_session(self):
         return await self._get_requester().close_session()
+
+    async def close(self):
+        await self.close_requester_session()
+
+        if self.__sync_state is not None:
+            await self.__sync_state.close()
@@ -1,18 +1,34 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, Optional, Set
 
 from .base_entity import BaseHydratedEntity
+from .write_buffer import WriteBuffer
 
 
 class BaseHydratedCollection(ABC):
-    def __init__(self, entities: list[BaseHydratedEntity], dedup_before_insert: bool = False):
+    def __init__(
+        self, entities: list[BaseHydratedEntity],
+        dedup_before_insert: bool = False, skip_unchanged: bool = False
+    ):
         self._entities = entities
 
         self._dedup_before_insert = dedup_before_insert
+        self._is_collapsed = False
         self._is_deduped = False
         self._dup_entities: list[BaseHydratedEntity] = []
 
+        self._skip_unchanged = skip_unchanged
+        self._is_unchanged_filtered = False
+        self._unchanged_entities: list[BaseHydratedEntity] = []
+
         self._db_conn = None
+        self._write_buffer: Optional[WriteBuffer] = None
+
+    def use_write_buffer(self, write_buffer: Optional[WriteBuffer]):
+        """
+        Write operations will be added into write_buffer instead of being sent to DB right away
+        """
+        self._write_buffer = write_buffer
 
     def _get_db_conn(self):
         if self._db_conn is None:
@@ -33,8 +49,8 @@ class BaseHydratedCollection(ABC):
     # thus instead of making them abstract they are just empty
     # in order not to force to create unused methods
 
-    async def _get_existing_unique_ids_from_db(self) -> List[str]:
-        return []
+    async def _get_existing_unique_ids_from_db(self) -> Set[str]:
+        return set()
 
     async def _insert_new_in_db(self):
         return
@@ -42,22 +58,95 @@ class BaseHydratedCollection(ABC):
     async def _update_existing_in_db(self):
         return
 
+    # the next 2 methods will be required
+    # only if skip_unchanged will be in place
+
+    async def _filter_unchanged(self):
+        """
+        Moves entities with the same fingerprint as the stored ones
+        from _entities to _unchanged_entities
+        """
+        return
+
+    async def _update_unchanged_in_db(self):
+        return
+
+    def prepare_for_save(self):
+        """
+        Computes sanitized raw_data & fingerprints of the entities ahead (e.g. in hydration process),
+        they are cached by the entities
+        """
+        for entity in self._entities:
+            entity.get_sanitized_raw_data()
+            entity.get_fingerprint()
+
+    def merge(self, collection: 'BaseHydratedCollection'):
+        """
+        Takes over entities of another (not yet saved) collection, e.g. of the next chunk of a streamed page
+        """
+        self._entities.extend(collection._entities)
+
+    def get_watermark(self) -> Optional[Any]:
+        """
+        Returns the comparable mark (e.g. max last_seen) the next incremental sync should start from,
+        None if the collection can't provide it
+        """
+        return None
+
     def len(self) -> int:
         return len(self._entities)
 
     def dup_len(self) -> int:
         return len(self._dup_entities)
 
+    def unchanged_len(self) -> int:
+        return len(self._unchanged_entities)
+
+    def _pick_duplicate(self, kept: BaseHydratedEntity, candidate: BaseHydratedEntity) -> BaseHydratedEntity:
+        """
+        Returns which one of the entities with the same unique_id
+        should be kept, when both of them came within the same page
+        """
+        return candidate
+
+    def _collapse_duplicates(self):
+        """
+        Vendors sometimes return the same entity twice on one page,
+        only one of them is kept
+        """
+        if self._is_collapsed:
+            return
+
+        entities_by_unique_id = {}
+        for entity in self._entities:
+            kept = entities_by_unique_id.get(entity.unique_id)
+            entities_by_unique_id[entity.unique_id] = entity if kept is None else self._pick_duplicate(kept, entity)
+
+        self._is_collapsed = True
+        self._entities = list(entities_by_unique_id.values())
+
     async def save_to_db(self):
+        self._collapse_duplicates()
+
+        # lookups in DB must see the writes of the previous pages
+        if (self._skip_unchanged or self._dedup_before_insert) and self._write_buffer is not None \
+                and self._write_buffer.has_pending(entity.unique_id for entity in self._entities):
+            await self._write_buffer.flush()
+
+        if self._skip_unchanged and not self._is_unchanged_filtered:
+            await self._filter_unchanged()
+            self._is_unchanged_filtered = True
+
         if not self._dedup_before_insert:
             await self._set_into_db()
+        else:
+            await self._dedup()
 
-            return
-
-        await self._dedup()
+            await self._insert_new_in_db()
+            await self._update_existing_in_db()
 
-        await self._insert_new_in_db()
-        await self._update_existing_in_db()
+        if self._skip_unchanged:
+            await self._update_unchanged_in_db()
 
     async def _dedup(self):
         if self._is_deduped:
@@ -66,7 +155,7 @@ class BaseHydratedCollection(ABC):
         new_entities = []
         dup_entities = []
 
-        existing_unique_ids = await self._get_existing_unique_ids_from_db()
+        existing_unique_ids = set(await self._get_existing_unique_ids_from_db())
         for entity in self._entities:
             if entity.unique_id in existing_unique_ids:
                 dup_entities.append(entity)
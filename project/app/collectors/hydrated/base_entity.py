@@ -1,11 +1,41 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
+import hashlib
 import inspect
-from typing import Dict, List, Any
+import json
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+
+
+def _without_field(data: Any, path: Tuple[str, ...]) -> Any:
+    """
+    Returns copy of data without the field at path, lists on the way are traversed item by item
+    """
+    if isinstance(data, list):
+        return [_without_field(item, path) for item in data]
+
+    if not isinstance(data, dict) or path[0] not in data:
+        return data
+
+    copied = dict(data)
+    if len(path) == 1:
+        del copied[path[0]]
+    else:
+        copied[path[0]] = _without_field(data[path[0]], path[1:])
+
+    return copied
 
 
 class BaseHydratedEntity(ABC):
-    def __init__(self, raw_data: Dict):
+    # entities are created per host on every page,
+    # so they are slotted to keep them small.
+    # Subclasses have to declare their own __slots__ as well
+    __slots__ = ('raw_data', 'unique_id', '_sanitized_raw_data', '_fingerprint', '_volatile_raw_fields')
+
+    def __init__(self, raw_data: Dict, volatile_raw_fields: Iterable[str] = ()):
         self.raw_data = raw_data
+        self._sanitized_raw_data: Optional[Dict[str, Any]] = None
+        self._fingerprint: Optional[str] = None
+        self._volatile_raw_fields = tuple(volatile_raw_fields)
 
         self.__validate()
         self.unique_id = self._generate_unique_id()
@@ -17,9 +47,44 @@ class BaseHydratedEntity(ABC):
     def _sanitize_raw_data(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         return raw_data
 
+    def get_sanitized_raw_data(self) -> Dict[str, Any]:
+        """
+        Sanitizes raw_data on the first call only
+        """
+        if self._sanitized_raw_data is None:
+            self._sanitized_raw_data = self._sanitize_raw_data(self.raw_data)
+
+        return self._sanitized_raw_data
+
+    def _get_fingerprint_data(self) -> Dict[str, Any]:
+        """
+        Returns data the content fingerprint is built of,
+        fields changing on every sync (e.g. last_seen) should be excluded,
+        so are the volatile_raw_fields (dotted paths) of raw_data
+        """
+        fingerprint_data = {field: getattr(self, field) for field in self._get_fields() if field != 'unique_id'}
+
+        raw_data = self.get_sanitized_raw_data()
+        for field in self._volatile_raw_fields:
+            raw_data = _without_field(raw_data, tuple(field.split('.')))
+        fingerprint_data["raw_data"] = raw_data
+
+        return fingerprint_data
+
+    def get_fingerprint(self) -> str:
+        if self._fingerprint is None:
+            serialized = json.dumps(self._get_fingerprint_data(), sort_keys=True, default=str)
+            self._fingerprint = hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+        return self._fingerprint
+
     def to_dict(self) -> Dict[str, Any]:
-        entDict = self.__dict__
-        entDict["raw_data"] = self._sanitize_raw_data(entDict)
+        """
+        Returns a new document, the entity itself stays untouched
+        """
+        entDict = {field: getattr(self, field) for field in self._get_fields()}
+        entDict["raw_data"] = self.get_sanitized_raw_data()
+        entDict["fingerprint"] = self.get_fingerprint()
 
         return entDict
 
@@ -27,6 +92,21 @@ class BaseHydratedEntity(ABC):
         return self.__class__.__name__
 
     @classmethod
+    @lru_cache(maxsize=None)
+    def _get_fields(cls) -> Tuple[str, ...]:
+        """
+        Returns public fields declared in __slots__ of the class & its parents
+        """
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for field in klass.__dict__.get('__slots__', ()):
+                if not field.startswith('_') and field != 'raw_data' and field not in fields:
+                    fields.append(field)
+
+        return tuple(fields)
+
+    @classmethod
+    @lru_cache(maxsize=None)
     def _get_required_fields(cls) -> List[str]:
         sig = inspect.signature(cls.__init__)
 
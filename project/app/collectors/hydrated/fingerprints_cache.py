@@ -0,0 +1,54 @@
+from collections import OrderedDict
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class FingerprintsCache():
+    """
+    Bounded LRU cache of what was last written into DB per unique_id:
+    (fingerprint, version), where version is entity specific (e.g. last_seen).
+
+    Shared by all the collections of the worker process
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.__max_size = max_size
+        self.__items: OrderedDict[str, Tuple[str, Any]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_many(self, unique_ids: Iterable[str]) -> Dict[str, Tuple[str, Any]]:
+        found = {}
+        with self.__lock:
+            for unique_id in unique_ids:
+                item = self.__items.get(unique_id)
+                if item is not None:
+                    self.__items.move_to_end(unique_id)
+                    found[unique_id] = item
+
+        return found
+
+    def set(self, unique_id: str, fingerprint: str, version: Optional[Any] = None):
+        with self.__lock:
+            self.__set(unique_id, fingerprint, version)
+
+    def set_if_newer(self, unique_id: str, fingerprint: str, version: Any):
+        """
+        Keeps the cached item, if its version is the same or later
+        """
+        with self.__lock:
+            item = self.__items.get(unique_id)
+            if item is not None and item[1] is not None and item[1] >= version:
+                return
+
+            self.__set(unique_id, fingerprint, version)
+
+    def __set(self, unique_id: str, fingerprint: str, version: Optional[Any]):
+        self.__items[unique_id] = (fingerprint, version)
+        self.__items.move_to_end(unique_id)
+
+        while len(self.__items) > self.__max_size:
+            self.__items.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
@@ -1,13 +1,42 @@
-from pymongo import UpdateOne
+from datetime import datetime, timezone
+from pymongo import InsertOne, UpdateOne
 from pymongo.errors import BulkWriteError
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Set, Optional, Tuple
 
 from ..base_collection import BaseHydratedCollection
 # from ....db.mongo import get_db_conn
 from ....db.async_mongo import get_db_conn
+from ..base_entity import BaseHydratedEntity
+from ..fingerprints_cache import FingerprintsCache
+
+
+# max number of unique_ids in a single `$in` lookup,
+# keeps the query far below Mongo's document size limit
+UNIQUE_IDS_CHUNK_SIZE = 5000
+
+# (fingerprint, last_seen) of hosts written by this worker process,
+# saves lookups of fingerprints in DB for hosts changed since then
+fingerprints_cache = FingerprintsCache()
+
+
+def _to_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    # Mongo returns naive datetimes (in UTC)
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+
+    return dt
 
 
 class HydratedHostsCollection(BaseHydratedCollection):
+    def __init__(
+        self, entities: List[BaseHydratedEntity],
+        dedup_before_insert: bool = False, skip_unchanged: bool = False
+    ):
+        super().__init__(entities, dedup_before_insert, skip_unchanged)
+
+        # last_seen of the stored hosts, found by _filter_unchanged()
+        self.__stored_last_seen: Dict[str, Optional[datetime]] = {}
+
     def _create_db_conn(self):
         return get_db_conn().hostsDiscovered
 
@@ -21,6 +50,10 @@ class HydratedHostsCollection(BaseHydratedCollection):
             return
 
         result = await self.__update_or_upsert_into_db(self._dup_entities, False)
+        if self._write_buffer is not None:
+            # will be written on flush, there's no result yet
+            return
+
         if result is None:
             raise RuntimeError(f"Failed to run update_existing query: {result} for {self._dup_entities}")
         if result.matched_count == 0:
@@ -28,16 +61,29 @@ class HydratedHostsCollection(BaseHydratedCollection):
 
         return
 
-    async def _get_existing_unique_ids_from_db(self) -> List[str]:
+    def get_watermark(self) -> Optional[datetime]:
+        entities = self._entities + self._dup_entities + self._unchanged_entities
+
+        return max((_to_utc(entity.last_seen) for entity in entities if entity.last_seen is not None), default=None)
+
+    def _pick_duplicate(self, kept: BaseHydratedEntity, candidate: BaseHydratedEntity) -> BaseHydratedEntity:
+        if kept.last_seen is not None and (candidate.last_seen is None or kept.last_seen > candidate.last_seen):
+            return kept
+
+        return candidate
+
+    async def _get_existing_unique_ids_from_db(self) -> Set[str]:
         unique_ids = [entity.unique_id for entity in self._entities]
-        cursor = self._get_db_conn().find(
-            {"unique_id": {"$in": unique_ids}},
-            {"unique_id": 1, "_id": 0}
-        )
 
-        existing_ids = []
-        async for doc in cursor:
-            existing_ids.append(doc["unique_id"])
+        existing_ids = set()
+        for i in range(0, len(unique_ids), UNIQUE_IDS_CHUNK_SIZE):
+            cursor = self._get_db_conn().find(
+                {"unique_id": {"$in": unique_ids[i:i + UNIQUE_IDS_CHUNK_SIZE]}},
+                {"unique_id": 1, "_id": 0}
+            )
+
+            async for doc in cursor:
+                existing_ids.add(doc["unique_id"])
 
         return existing_ids
 
@@ -46,6 +92,11 @@ class HydratedHostsCollection(BaseHydratedCollection):
             return
 
         docs = [entity.to_dict() for entity in self._entities]
+        if self._write_buffer is not None:
+            await self.__add_to_write_buffer([InsertOne(doc) for doc in docs], self._entities)
+
+            return
+
         try:
             result = await self._get_db_conn().insert_many(docs, ordered=False)
             if not result.acknowledged:
@@ -53,6 +104,124 @@ class HydratedHostsCollection(BaseHydratedCollection):
         except BulkWriteError as err:
             raise RuntimeError(f"Bulk insert error: {err.details}")
 
+        self.__cache_fingerprints(self._entities)
+
+    async def _get_stored_fingerprints_from_db(self, unique_ids: List[str]) -> Dict[str, Tuple[str, Optional[datetime]]]:
+        stored = {}
+        for i in range(0, len(unique_ids), UNIQUE_IDS_CHUNK_SIZE):
+            cursor = self._get_db_conn().find(
+                {"unique_id": {"$in": unique_ids[i:i + UNIQUE_IDS_CHUNK_SIZE]}},
+                {"unique_id": 1, "fingerprint": 1, "last_seen": 1, "_id": 0}
+            )
+
+            async for doc in cursor:
+                if doc.get("fingerprint"):
+                    stored[doc["unique_id"]] = (doc["fingerprint"], doc.get("last_seen"))
+
+        return stored
+
+    async def _filter_unchanged(self):
+        # the cache only rules out hosts changed since this worker wrote them,
+        # the rest are confirmed by DB, as other workers (or manual fixes) may change the stored docs
+        cached = fingerprints_cache.get_many(entity.unique_id for entity in self._entities)
+
+        changed_entities = []
+        candidates = []
+        for entity in self._entities:
+            cached_fingerprint, _ = cached.get(entity.unique_id, (None, None))
+            if cached_fingerprint is not None and cached_fingerprint != entity.get_fingerprint():
+                changed_entities.append(entity)
+            else:
+                candidates.append(entity)
+
+        stored = {}
+        if candidates:
+            stored = await self._get_stored_fingerprints_from_db([entity.unique_id for entity in candidates])
+
+        self.__stored_last_seen = {unique_id: _to_utc(last_seen) for unique_id, (_, last_seen) in cached.items()}
+        self.__stored_last_seen.update(
+            {unique_id: _to_utc(last_seen) for unique_id, (_, last_seen) in stored.items()}
+        )
+
+        unchanged_entities = []
+        for entity in candidates:
+            stored_fingerprint, stored_last_seen = stored.get(entity.unique_id, (None, None))
+            if stored_fingerprint is None or stored_fingerprint != entity.get_fingerprint():
+                changed_entities.append(entity)
+                continue
+
+            # content is the same, only later last_seen is worth writing
+            stored_last_seen = _to_utc(stored_last_seen)
+            if entity.last_seen is not None and (stored_last_seen is None or entity.last_seen > stored_last_seen):
+                unchanged_entities.append(entity)
+
+        self._entities = changed_entities
+        self._unchanged_entities = unchanged_entities
+
+    async def _update_unchanged_in_db(self):
+        if not self.unchanged_len():
+            return
+
+        update_operations = [
+            UpdateOne(
+                {"unique_id": entity.unique_id},
+                {"$max": {"last_seen": entity.last_seen}}
+            ) for entity in self._unchanged_entities
+        ]
+
+        if self._write_buffer is not None:
+            await self.__add_to_write_buffer(update_operations, self._unchanged_entities)
+
+            return
+
+        try:
+            await self._get_db_conn().bulk_write(update_operations, ordered=False)
+        except BulkWriteError as err:
+            raise RuntimeError(f"Bulk last_seen update failed: {err.details}")
+
+        self.__cache_fingerprints(self._unchanged_entities)
+
+    async def __add_to_write_buffer(
+        self, operations: List[Any], entities: List[BaseHydratedEntity],
+        cache_fingerprints: Optional[Callable[[List[BaseHydratedEntity]], None]] = None
+    ):
+        if cache_fingerprints is None:
+            cache_fingerprints = self.__cache_fingerprints
+
+        # cached only once written, otherwise failed writes would be skipped as unchanged by the next syncs
+        await self._write_buffer.add(
+            self._get_db_conn(),
+            operations,
+            [entity.unique_id for entity in entities],
+            lambda: cache_fingerprints(entities)
+        )
+
+    def __cache_fingerprints(self, entities: List[BaseHydratedEntity]):
+        if not self._skip_unchanged:
+            return
+
+        for entity in entities:
+            fingerprints_cache.set(entity.unique_id, entity.get_fingerprint(), entity.last_seen)
+
+    def __cache_upserted_fingerprints(self, entities: List[BaseHydratedEntity]):
+        """
+        Upsert keeps the stored raw_data & fingerprint, unless the new last_seen is later,
+        so fingerprints of older entities are not cached
+        """
+        if not self._skip_unchanged:
+            return
+
+        for entity in entities:
+            last_seen = _to_utc(entity.last_seen)
+            if last_seen is None:
+                continue
+
+            stored_last_seen = self.__stored_last_seen.get(entity.unique_id)
+            if stored_last_seen is not None and last_seen <= stored_last_seen:
+                continue
+
+            fingerprints_cache.set_if_newer(entity.unique_id, entity.get_fingerprint(), last_seen)
+
     async def __update_or_upsert_into_db(self, entities: List[Dict[str, Any]], upsert: bool):
         if not len(entities):
             return
@@ -84,6 +253,18 @@ class HydratedHostsCollection(BaseHydratedCollection):
                                 ]
                             },
 
+                            # fingerprint follows raw_data, docs saved before fingerprints get it anyway
+                            "fingerprint": {
+                                "$cond": [
+                                    {"$or": [
+                                        {"$gt": [entityDict["last_seen"], "$last_seen"]},
+                                        {"$eq": [{"$type": "$fingerprint"}, "missing"]}
+                                    ]},
+                                    entityDict["fingerprint"],
+                                    "$fingerprint"
+                                ]
+                            },
+
                             # because we might have upsert=True here we need to specify all required fields
                             "source": {"$ifNull": ["$source", entityDict["source"]]},
                             "ip": {"$ifNull": ["$ip", entityDict["ip"]]},
@@ -99,7 +280,16 @@ class HydratedHostsCollection(BaseHydratedCollection):
             )
 
         if update_operations:
+            if self._write_buffer is not None:
+                await self.__add_to_write_buffer(update_operations, entities, self.__cache_upserted_fingerprints)
+
+                return None
+
             try:
-                return await self._get_db_conn().bulk_write(update_operations, ordered=False)
+                result = await self._get_db_conn().bulk_write(update_operations, ordered=False)
             except BulkWriteError as err:
                 raise RuntimeError(f"Bulk update operation failed: {err.details}")
+
+            self.__cache_upserted_fingerprints(entities)
+
+            return result
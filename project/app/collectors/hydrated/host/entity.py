@@ -1,18 +1,21 @@
 import hashlib
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from datetime import datetime
 
 from ..base_entity import BaseHydratedEntity
 
 
 class HydratedHost(BaseHydratedEntity):
+    __slots__ = ('source', 'ip', 'mac', 'os', 'os_version', 'name', 'first_seen', 'last_seen')
+
     def __init__(
             self,
             source: str,
             ip: str, mac: str,
             os: str, os_version: str, name: str,
             first_seen: datetime, last_seen: datetime,
-            raw_data
+            raw_data,
+            volatile_raw_fields: Iterable[str] = ()
     ):
         self.source = source
 
@@ -24,7 +27,7 @@ class HydratedHost(BaseHydratedEntity):
         self.first_seen = first_seen
         self.last_seen = last_seen
 
-        super().__init__(raw_data)
+        super().__init__(raw_data, volatile_raw_fields)
 
     def _generate_unique_id(self) -> str:
         # keeping the same hosts, but from different vendors
@@ -32,6 +35,14 @@ class HydratedHost(BaseHydratedEntity):
 
         return hashlib.sha256(raw).hexdigest()
 
+    def _get_fingerprint_data(self) -> Dict[str, Any]:
+        # last_seen is bumped by vendors on every poll (so is its raw_data field, see volatile_raw_fields),
+        # it's updated separately for unchanged hosts
+        fingerprint_data = super()._get_fingerprint_data()
+        del fingerprint_data["last_seen"]
+
+        return fingerprint_data
+
     def _sanitize_raw_data(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         def recursive_escape(data: Dict[str, Any]) -> Dict[str, Any]:
             if isinstance(data, dict):
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from pymongo.errors import BulkWriteError
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class WriteBufferFlushException(RuntimeError):
+    """
+    Raised once all the buffered collections were tried, if writes into any of them failed
+    """
+
+    def __init__(self, failures: Dict[str, Exception]):
+        self.failures = failures
+
+        super().__init__("Buffered bulk writes failed: " + "; ".join(
+            f"{full_name}: {err.details if isinstance(err, BulkWriteError) else err}"
+            for full_name, err in failures.items()
+        ))
+
+
+class WriteBuffer():
+    """
+    Accumulates write operations of hydrated collections across pages
+    and flushes them with unordered bulk writes, once max_size operations are buffered
+    or max_delay seconds passed since the first buffered operation.
+
+    The owner has to call flush() when the job is done (or failed),
+    on_flushed callbacks are called only once their operations are written
+    """
+
+    def __init__(self, max_size: int, max_delay: float = 0):
+        self.__max_size = max_size
+        self.__max_delay = max_delay
+
+        # db collection full_name => (db collection, operations, on_flushed callbacks)
+        self.__operations: Dict[str, Tuple[Any, List[Any], List[Callable[[], None]]]] = {}
+        self.__operations_count = 0
+        self.__pending_unique_ids: Set[str] = set()
+        self.__first_added_at: Optional[float] = None
+
+        self.__lock: Optional[asyncio.Lock] = None
+
+    def __get_lock(self) -> asyncio.Lock:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+
+        return self.__lock
+
+    def len(self) -> int:
+        return self.__operations_count
+
+    def has_pending(self, unique_ids: Iterable[str]) -> bool:
+        """
+        Returns True if any of unique_ids has operations waiting to be flushed
+        """
+        return not self.__pending_unique_ids.isdisjoint(unique_ids)
+
+    async def add(
+        self, db_collection, operations: List[Any], unique_ids: Iterable[str] = (),
+        on_flushed: Optional[Callable[[], None]] = None
+    ):
+        if not operations:
+            return
+
+        if self.__first_added_at is None:
+            self.__first_added_at = time.monotonic()
+
+        _, buffered_operations, callbacks = self.__operations.setdefault(db_collection.full_name, (db_collection, [], []))
+        buffered_operations.extend(operations)
+        if on_flushed is not None:
+            callbacks.append(on_flushed)
+
+        self.__operations_count += len(operations)
+        self.__pending_unique_ids.update(unique_ids)
+
+        if self.__is_full() or self.__is_expired():
+            await self.flush()
+
+    def __is_full(self) -> bool:
+        return self.__operations_count >= self.__max_size
+
+    def __is_expired(self) -> bool:
+        return bool(self.__max_delay) and self.__first_added_at is not None \
+            and time.monotonic() - self.__first_added_at >= self.__max_delay
+
+    async def flush(self):
+        async with self.__get_lock():
+            buffered = self.__operations
+
+            self.__operations = {}
+            self.__operations_count = 0
+            self.__pending_unique_ids = set()
+            self.__first_added_at = None
+
+            # a failed collection doesn't stop writes (and callbacks) of the others
+            failures = {}
+            for full_name, (db_collection, operations, callbacks) in buffered.items():
+                try:
+                    await db_collection.bulk_write(operations, ordered=False)
+                except Exception as err:
+                    failures[full_name] = err
+                    continue
+
+                for callback in callbacks:
+                    callback()
+
+            if failures:
+                raise WriteBufferFlushException(failures)
@@ -0,0 +1,56 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Optional
+
+from .hydrated.base_collection import BaseHydratedCollection
+
+
+# shared by all the collectors of the worker process,
+# spawned (not forked) children don't inherit worker's threads, sockets & db clients
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_hydration_executor(processes: int) -> ProcessPoolExecutor:
+    """
+    Returns the process pool, it's created on the first call with `processes` workers
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+        return _executor
+
+
+def shutdown_hydration_executor():
+    global _executor
+
+    with _executor_lock:
+        executor = _executor
+        _executor = None
+
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+@lru_cache(maxsize=None)
+def _get_collector(collector_type: str):
+    # including with lazy to avoid dependency chain
+    from .utils import create_collector
+
+    return create_collector(collector_type)
+
+
+def hydrate_in_process(collector_type: str, raw_data: Any) -> BaseHydratedCollection:
+    """
+    Runs in the pool's process: hydrates raw_data with the vendor's collector
+    and computes everything save_to_db() needs, so the worker's event loop only writes
+    """
+    hydratedCollection = _get_collector(collector_type)._hydrate(raw_data)
+    hydratedCollection.prepare_for_save()
+
+    return hydratedCollection
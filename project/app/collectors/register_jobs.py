@@ -1,11 +1,36 @@
+import random
 import time
+from functools import lru_cache
+from typing import Dict, Tuple
 
+from ..db.indexes import setup_indexes
+from ..db.mongo import get_db_conn
+from .async_worker import enqueue_job
+from .sync_state import is_vendor_running
 from .worker import run_job, JobData
-from .utils import get_vendor_names, read_yaml
+from .utils import VENDORS_PATH, get_vendor_names, read_yaml
+
+# seconds between checks of the vendors' schedules
+SCHEDULER_TICK = 10
+
+
+@lru_cache(maxsize=None)
+def get_worker_type() -> str:
+    """
+    Returns which workers run the jobs: celery (worker.py) or asyncio (async_worker.py)
+    """
+    return read_yaml().get('worker_type', 'celery')
 
 
 def register_job(collector_type: str, job_data: JobData = None):
     job_data_dict = job_data.to_dict() if job_data is not None else None
+
+    if get_worker_type() == 'asyncio':
+        enqueue_job(collector_type, job_data_dict)
+        print(f"Job queued for asyncio worker: {collector_type}, {job_data_dict}")
+
+        return
+
     job = run_job.delay(collector_type, job_data_dict)
 
     print(f"Job queued: {job.id}, {collector_type}, {job_data_dict}")
@@ -16,14 +41,57 @@ def register_all_jobs():
         register_job(vendor_name)
 
 
+def get_vendor_schedule(vendor_name: str, base_config: Dict) -> Tuple[int, int]:
+    """
+    Returns vendor's schedule_interval (in minutes) & schedule_jitter (in seconds),
+    both fall back to the base config
+    """
+    config = read_yaml(VENDORS_PATH / vendor_name / 'config.yaml')
+
+    interval = config.get('schedule_interval') or base_config.get('scheduler_tf', 5)
+    jitter = config.get('schedule_jitter') or base_config.get('schedule_jitter', 0)
+
+    return interval, jitter
+
+
+def register_due_jobs(next_run_at: Dict[str, float], base_config: Dict):
+    """
+    Registers jobs of the vendors whose time has come, unless the vendor's previous run is still in progress
+    """
+    now = time.time()
+    for vendor_name in get_vendor_names():
+        try:
+            interval, jitter = get_vendor_schedule(vendor_name, base_config)
+        except Exception as e:
+            print(f"Failed to read schedule of {vendor_name}: {e}")
+            continue
+
+        if vendor_name not in next_run_at:
+            # spreading the first runs, so vendors don't start all at once
+            next_run_at[vendor_name] = now + random.uniform(0, jitter)
+
+        if now < next_run_at[vendor_name]:
+            continue
+
+        next_run_at[vendor_name] = now + interval * 60 + random.uniform(0, jitter)
+
+        if is_vendor_running(vendor_name):
+            print(f"Skipping {vendor_name}: previous run is still in progress")
+            continue
+
+        register_job(vendor_name)
+
+
 if __name__ == "__main__":
+    setup_indexes(get_db_conn())
+
     print("Scheduling jobs...")
 
     base_config = read_yaml()
-    # tf in minutes in which jobs will be scheduled, default 5
-    interval_min = base_config.get("scheduler_tf", "5")
 
+    # vendor_name => unix time of its next run
+    next_run_at: Dict[str, float] = {}
     while True:
-        register_all_jobs()
+        register_due_jobs(next_run_at, base_config)
 
-        time.sleep(interval_min * 60)
+        time.sleep(SCHEDULER_TICK)
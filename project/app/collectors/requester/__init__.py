@@ -4,6 +4,8 @@ from .basic_auth_requester import BasicAuthRequester
 from .token_auth_requester import TokenAuthRequester
 from .token_bearer_auth_requester import TokenBearerAuthRequester
 from .oauth_requester import OAuthRequester
+from .retry_policy import RetryPolicy, RequestFailedException
+from .http_config import HttpConfig
 
 __all__ = [
     "BaseRequester",
@@ -12,4 +14,7 @@ __all__ = [
     "TokenAuthRequester",
     "TokenBearerAuthRequester",
     "OAuthRequester",
+    "RetryPolicy",
+    "RequestFailedException",
+    "HttpConfig",
 ]
@@ -1,11 +1,28 @@
 from abc import ABC, abstractmethod
 import asyncio
 import aiohttp
+from contextlib import asynccontextmanager
 from requests.models import Response
-from typing import Union, Dict, List, Any, Optional
+from typing import Union, Dict, List, Any, Optional, AsyncIterator
 import xml.etree.ElementTree as ET
 
-from .rate_limiter import RateLimitLimitReachedException, RateLimiter
+from ...db import serialization
+from .rate_limiter import RateLimiter
+from .redis_rate_limiter import RedisRateLimiter
+from .rate_limit_headers import RateLimitHeaders
+from .session_pool import get_shared_session
+from .http_config import HttpConfig
+from .retry_policy import RetryPolicy, RequestFailedException, parse_retry_after
+
+
+def _import_ijson():
+    # ijson is needed only by vendors with streamed responses
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError("ijson is required for streamed responses (stream_items_path), install it with `pip install ijson`")
+
+    return ijson
 
 
 class BaseRequester(ABC):
@@ -19,13 +36,57 @@ class BaseRequester(ABC):
         self._timeout = timeout_in_seconds
 
         self._session: Optional[aiohttp.ClientSession] = None
+        self._shared_session_key: Optional[str] = None
         self._authenticated = False
 
-        self._rate_limiter = RateLimiter(**rate_limit_config)
+        self._rate_limiter = self._create_rate_limiter(rate_limit_config)
+        self._rate_limit_headers = RateLimitHeaders(**rate_limit_config.get('headers', {}))
+        self._retry_policy = RetryPolicy()
+        self._http_config = HttpConfig()
+
+    def set_retry_policy(self, retry_policy: RetryPolicy):
+        self._retry_policy = retry_policy
+
+    def set_http_config(self, http_config: HttpConfig):
+        """
+        Applies to the session created after the call
+        """
+        self._http_config = http_config
+
+    def _create_rate_limiter(self, rate_limit_config: Dict[str, Any]) -> Union[RateLimiter, RedisRateLimiter]:
+        config = dict(rate_limit_config)
+        config.pop('headers', None)
+
+        match config.pop('storage', 'local'):
+            case 'redis':
+                return RedisRateLimiter(
+                    config.get('vendor_name'),
+                    config.get('requests_allowed'),
+                    config.get('timeframe', 0)
+                )
+
+            case _:
+                return RateLimiter(**config)
+
+    def use_shared_session(self, key: str):
+        """
+        Session will be shared by the requesters of the same event loop & key,
+        close_session() leaves it open for the next ones
+        """
+        self._shared_session_key = key
+
+    def _build_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            connector=self._http_config.create_connector(),
+            timeout=self._http_config.create_timeout(self._timeout),
+            headers=self._http_config.get_headers(),
+        )
 
     async def _create_session(self):
-        timeout = aiohttp.ClientTimeout(total=self._timeout)
-        self._session = aiohttp.ClientSession(timeout=timeout)
+        if self._shared_session_key is not None:
+            self._session = get_shared_session(self._shared_session_key, self._build_session)
+        else:
+            self._session = self._build_session()
 
     async def _get_session(self):
         if self._session is None:
@@ -34,61 +95,175 @@ class BaseRequester(ABC):
         return self._session
 
     async def close_session(self):
-        if self._session is not None:
+        if self._session is not None and self._shared_session_key is None:
             await self._session.close()
 
+        await self._rate_limiter.close()
+
     @abstractmethod
     async def authenticate(self):
         pass
 
+    async def _get_request_headers(self) -> Optional[Dict[str, str]]:
+        """
+        Headers added to each request, on top of the session's ones
+        """
+        return None
+
+    async def _reset_authentication(self, rejected_headers: Optional[Dict[str, str]]) -> bool:
+        """
+        Called when the vendor rejected the credentials (401) sent with rejected_headers,
+        returns whether the request is worth retrying with the new ones
+        """
+        return False
+
+    async def __get_headers(self) -> Optional[Dict[str, str]]:
+        if not self._authenticated:
+            await self.authenticate()
+
+        return await self._get_request_headers()
+
     def get_rate_limiter_data(self):
         return self._rate_limiter.to_dict()
 
+    def _get_url(self, endpoint: str) -> str:
+        return f"{self._base_url}/{endpoint.lstrip('/')}"
+
     async def request(self, endpoint, method='GET', data=None):
-        if not self._authenticated:
-            await self.authenticate()
+        """
+        Makes a request, failed ones are retried according to the retry policy
 
-        try:
-            self._rate_limiter.check()
-        except RateLimitLimitReachedException as e:
-            # rate limit achieved, sleeping till the next timeframe starts
-            print(f"Rate limit reached: {e}")
-            await asyncio.sleep(e.seconds_until_next_timeframe())
-            print("Waked up from waiting for the next rate limit timeframe")
-
-        url = f"{self._base_url}/{endpoint.lstrip('/')}"
+        Raises RequestFailedException if all the attempts failed
+        """
+        url = self._get_url(endpoint)
+        method = self.__validate_method(method)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            headers = await self.__get_headers()
+
+            try:
+                async with self._open_response(url, method, data, headers) as response:
+                    return await self.parse_response(response)
+
+            except RequestFailedException as e:
+                await self.__wait_before_retry(attempt, e, headers)
+
+    async def request_stream(self, endpoint, method='GET', data=None, items_path: str = 'item') -> AsyncIterator[Any]:
+        """
+        Makes a request & yields items found at items_path (ijson prefix, e.g. `item` for top level array)
+        of JSON response while it's being downloaded.
+
+        Only failures before the first item are retried,
+        the rest raise RequestFailedException, as the items are consumed already
+        """
+        ijson = _import_ijson()
+
+        url = self._get_url(endpoint)
+        method = self.__validate_method(method)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            is_streaming = False
+            headers = await self.__get_headers()
+
+            try:
+                async with self._open_response(url, method, data, headers) as response:
+                    is_streaming = True
+
+                    async for item in ijson.items(response.content, items_path, use_float=True):
+                        yield item
+
+                    return
+
+            except RequestFailedException as e:
+                if is_streaming:
+                    raise
+
+                await self.__wait_before_retry(attempt, e, headers)
+
+    @staticmethod
+    def __validate_method(method: str) -> str:
         method = method.upper()
+        if method not in ('GET', 'POST'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
 
-        try:
-            current_session = await self._get_session()
+        return method
 
-            if method == 'GET':
-                async with current_session.get(url, params=data) as response:
-                    response.raise_for_status()
+    async def __wait_before_retry(self, attempt: int, failure: RequestFailedException, headers: Optional[Dict[str, str]]):
+        """
+        Raises the failure if it shouldn't be retried
+        """
+        if failure.status() == 401 and attempt == 1 and await self._reset_authentication(headers):
+            # e.g. token was revoked before expiry, next attempt authenticates again
+            print(f"{failure}, retrying with new credentials (attempt {attempt})")
+            return
 
-                    return await self.parse_response(response)
+        if not self._retry_policy.should_retry(attempt, failure.status()):
+            raise failure
 
-            elif method == 'POST':
-                async with current_session.post(url, params=data) as response:
-                    response.raise_for_status()
+        if failure.retry_after() is not None:
+            # vendor knows better, requests of all the jobs wait till then
+            await self._rate_limiter.block_for(failure.retry_after())
+            print(f"{failure}, retrying after {failure.retry_after()} seconds (attempt {attempt})")
+        else:
+            backoff = self._retry_policy.get_backoff(attempt)
+            print(f"{failure}, retrying in {backoff:.2f} seconds (attempt {attempt})")
+            await asyncio.sleep(backoff)
 
-                    return await self.parse_response(response)
+    @asynccontextmanager
+    async def _open_response(
+        self, url: str, method: str, data=None, headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Yields successful response, failures are raised as RequestFailedException
+        """
+        # waits (if needed) exactly till the rate limit slot frees up
+        await self._rate_limiter.acquire()
+
+        try:
+            current_session = await self._get_session()
+
+            async with current_session.request(method, url, params=data, headers=headers) as response:
+                await self._sync_rate_limiter(response)
+                self._raise_for_status(response)
 
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+                yield response
 
         except aiohttp.ClientResponseError as e:
-            print(f"Request error: status_code={e.status}, message={e.message}")
+            raise RequestFailedException(
+                f"Request error: status_code={e.status}, message={e.message}",
+                e.status,
+                parse_retry_after(e.headers.get('Retry-After')) if e.headers else None
+            )
 
-        except aiohttp.ClientError as e:
-            print(f"Request failed: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise RequestFailedException(f"Request failed: {e!r}")
 
-        return None
+    async def _sync_rate_limiter(self, response: aiohttp.ClientResponse):
+        """
+        Adjusts the rate limiter to vendor's rate limit headers, if they are configured
+        """
+        requests_allowed, requests_remaining, seconds_until_reset = self._rate_limit_headers.parse(response.headers)
+        if requests_allowed is None and requests_remaining is None:
+            return
+
+        await self._rate_limiter.sync_with_vendor(requests_remaining, seconds_until_reset, requests_allowed)
+
+    def _raise_for_status(self, response: aiohttp.ClientResponse):
+        if response.status >= 400:
+            raise RequestFailedException(
+                f"Request error: status_code={response.status}, message={response.reason}",
+                response.status,
+                parse_retry_after(response.headers.get('Retry-After'))
+            )
 
     async def parse_response(self, response: Response) -> Union[Dict, List, str, ET.Element, ET.ElementTree]:
         match self._response_type:
             case 'json':
-                return await response.json()
+                return await response.json(loads=serialization.loads)
             case 'xml':
                 return await response.xml()
             case _:
@@ -11,13 +11,15 @@ class BasicAuthRequester(BaseRequester):
         rate_limit_config: Dict[str, Any],
         username: str, password: str
     ):
-        super().__init__(base_url, response_type, timeout_in_seconds)
+        super().__init__(base_url, response_type, timeout_in_seconds, rate_limit_config)
 
         self.__username = username
         self.__password = password
 
     async def authenticate(self):
         current_session = await self._get_session()
-        current_session.auth = aiohttp.BasicAuth(self.__username, self.__password)
+        current_session.headers.update({
+            'Authorization': aiohttp.BasicAuth(self.__username, self.__password).encode()
+        })
 
-        self.authenticated = True
+        self._authenticated = True
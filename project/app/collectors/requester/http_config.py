@@ -0,0 +1,64 @@
+from typing import Dict, Optional
+
+import aiohttp
+
+
+def _is_brotli_available() -> bool:
+    # aiohttp decodes br responses only with brotli (or brotlicffi) installed
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+
+    return False
+
+
+class HttpConfig():
+    """
+    Connection settings of the vendor's session, hydrated from `http` config
+    """
+
+    def __init__(
+        self,
+        limit: int = 100, limit_per_host: int = 0,
+        keepalive_timeout: float = 15, ttl_dns_cache: Optional[int] = 10,
+        connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+        compression: bool = True
+    ):
+        self.__limit = limit
+        self.__limit_per_host = limit_per_host
+        self.__keepalive_timeout = keepalive_timeout
+        self.__ttl_dns_cache = ttl_dns_cache
+        self.__connect_timeout = connect_timeout
+        self.__read_timeout = read_timeout
+        self.__compression = compression
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        """
+        Has to be called within the event loop the session runs in
+        """
+        return aiohttp.TCPConnector(
+            limit=self.__limit,
+            limit_per_host=self.__limit_per_host,
+            keepalive_timeout=self.__keepalive_timeout,
+            ttl_dns_cache=self.__ttl_dns_cache,
+        )
+
+    def create_timeout(self, total: Optional[float]) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=total,
+            sock_connect=self.__connect_timeout,
+            sock_read=self.__read_timeout,
+        )
+
+    def get_headers(self) -> Dict[str, str]:
+        if not self.__compression:
+            return {'Accept-Encoding': 'identity'}
+
+        encodings = ['gzip', 'deflate']
+        if _is_brotli_available():
+            encodings.append('br')
+
+        return {'Accept-Encoding': ', '.join(encodings)}
@@ -1,7 +1,9 @@
 import aiohttp
-from typing import Dict, Any
+import hashlib
+from typing import Dict, Any, Optional, Tuple
 
 from .base_requester import BaseRequester
+from .token_cache import token_cache
 
 
 class OAuthRequester(BaseRequester):
@@ -9,7 +11,8 @@ class OAuthRequester(BaseRequester):
         self,
         base_url: str, response_type: str, timeoutInSeconds: int,
         rate_limit_config: Dict[str, Any],
-        token_url: str, client_id: str, client_secret: str, scope: str = None
+        token_url: str, client_id: str, client_secret: str, scope: str = None,
+        token_storage: str = 'local'
     ):
         super().__init__(base_url, response_type, timeoutInSeconds, rate_limit_config)
 
@@ -17,9 +20,37 @@ class OAuthRequester(BaseRequester):
         self.__client_id = client_id
         self.__client_secret = client_secret
         self.__scope = scope
-        self.__access_token = None
+        self.__use_redis = token_storage == 'redis'
 
     async def authenticate(self):
+        await self.__get_access_token()
+
+        self._authenticated = True
+
+    async def _get_request_headers(self) -> Optional[Dict[str, str]]:
+        # token may be refreshed between the requests, so it isn't stored in the (shared) session
+        return {
+            'Authorization': f'Bearer {await self.__get_access_token()}'
+        }
+
+    async def _reset_authentication(self, rejected_headers: Optional[Dict[str, str]]) -> bool:
+        # the token may be refreshed by a concurrent request already, then it's kept
+        rejected_token = (rejected_headers or {}).get('Authorization', '').removeprefix('Bearer ')
+        if rejected_token:
+            await token_cache.invalidate(self.__get_token_key(), rejected_token, self.__use_redis)
+
+        self._authenticated = False
+
+        return True
+
+    def __get_token_key(self) -> str:
+        # secret isn't a part of the key, as the key is stored in Redis
+        return hashlib.sha256(f"{self.__token_url}|{self.__client_id}|{self.__scope}".encode()).hexdigest()
+
+    async def __get_access_token(self) -> str:
+        return await token_cache.get_token(self.__get_token_key(), self.__fetch_token, self.__use_redis)
+
+    async def __fetch_token(self) -> Tuple[str, Optional[float]]:
         data = {
             'grant_type': 'client_credentials',
             'client_id': self.__client_id,
@@ -35,12 +66,9 @@ class OAuthRequester(BaseRequester):
                 response.raise_for_status()
 
                 token_info = await response.json()
-                self.__access_token = token_info['access_token']
-                current_session.headers.update({
-                    'Authorization': f'Bearer {self.__access_token}'
-                })
+                print(f"Fetched OAuth token from {self.__token_url}")
 
-                self.authenticated = True
+                return token_info['access_token'], token_info.get('expires_in')
 
         except aiohttp.ClientResponseError as e:
             raise RuntimeError(f"OAuth authentication failed: {e}")
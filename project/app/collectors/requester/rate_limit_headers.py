@@ -0,0 +1,59 @@
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+class RateLimitHeaders():
+    """
+    Names of the vendor's response headers describing its rate limit,
+    headers, which are not configured (or not sent), are ignored.
+
+    reset_format:
+        seconds - reset header contains seconds until the limit resets
+        epoch - reset header contains unix time of the reset
+    """
+
+    def __init__(
+        self,
+        limit: Optional[str] = None, remaining: Optional[str] = None, reset: Optional[str] = None,
+        reset_format: str = 'seconds'
+    ):
+        if reset_format not in ('seconds', 'epoch'):
+            raise ValueError(f"Unsupported rate limit reset_format: {reset_format}")
+
+        self.__limit = limit
+        self.__remaining = remaining
+        self.__reset = reset
+        self.__reset_format = reset_format
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.__limit,
+            "remaining": self.__remaining,
+            "reset": self.__reset,
+            "reset_format": self.__reset_format,
+        }
+
+    def parse(self, headers: Mapping[str, str]) -> Tuple[Optional[int], Optional[int], Optional[float]]:
+        """
+        Returns requests allowed, requests remaining & seconds until the reset
+        """
+        limit = self.__get_number(headers, self.__limit)
+        remaining = self.__get_number(headers, self.__remaining)
+
+        seconds_until_reset = self.__get_number(headers, self.__reset, float)
+        if seconds_until_reset is not None and self.__reset_format == 'epoch':
+            seconds_until_reset -= time.time()
+        if seconds_until_reset is not None:
+            seconds_until_reset = max(seconds_until_reset, 0)
+
+        return limit, remaining, seconds_until_reset
+
+    @staticmethod
+    def __get_number(headers: Mapping[str, str], name: Optional[str], cast=int):
+        if name is None or headers.get(name) is None:
+            return None
+
+        try:
+            return cast(float(headers.get(name)))
+        except ValueError:
+            return None
@@ -1,4 +1,6 @@
+import asyncio
 import time
+from typing import Optional, Union
 
 
 class RateLimitMissingAttributeException(AttributeError):
@@ -7,7 +9,7 @@ class RateLimitMissingAttributeException(AttributeError):
 
 
 class RateLimitLimitReachedException(Exception):
-    def __init__(self, message, seconds_until_next_timeframe: int):
+    def __init__(self, message, seconds_until_next_timeframe: Union[int, float]):
         super().__init__(message)
 
         self.__seconds_until_next_timeframe = seconds_until_next_timeframe
@@ -21,15 +23,24 @@ class RateLimiter():
         self,
         vendor_name: str,
         requests_allowed: int, timeframe: int = 0,
-        requests_done: int = 0, started_at: int = 0
+        requests_done: int = 0, started_at: float = 0
     ):
         self.__vendor_name = vendor_name
 
         self.__requests_allowed = requests_allowed
         self.__timeframe = timeframe
+        # timeframe of the current window may be the vendor's one, it's back to this one on reset
+        self.__configured_timeframe = timeframe
 
+        # timeframe start is tracked with monotonic clock,
+        # `started_at` (unix time) is used only to pass the state between jobs
         self.__requests_done = requests_done
-        self.__started_at = started_at
+        self.__started_at = self.__unix_to_monotonic(started_at) if started_at else None
+
+        # set when vendor asks to wait (e.g. 429 with Retry-After), monotonic
+        self.__blocked_until: Optional[float] = None
+
+        self.__lock: Optional[asyncio.Lock] = None
 
         self.__validate()
 
@@ -49,31 +60,49 @@ class RateLimiter():
             "vendor_name": self.__vendor_name,
 
             "requests_allowed": self.__requests_allowed,
-            "timeframe": self.__timeframe,
+            "timeframe": self.__configured_timeframe,
 
             "requests_done": self.__requests_done,
-            "started_at": self.__started_at,
+            # so that the current window ends at the same time, whatever its timeframe is
+            "started_at": self.__monotonic_to_unix(
+                self.__started_at + self.__timeframe - self.__configured_timeframe
+            ) if self.__started_at is not None else 0,
         }
 
-    def __unix_now_in_seconds(self):
-        return int(time.time())
+    @staticmethod
+    def __unix_to_monotonic(unix_time: float) -> float:
+        return time.monotonic() - (time.time() - unix_time)
+
+    @staticmethod
+    def __monotonic_to_unix(monotonic_time: float) -> float:
+        return time.time() - (time.monotonic() - monotonic_time)
 
     def __reset(self):
         self.__requests_done = 0
-        self.__started_at = self.__unix_now_in_seconds()
+        self.__started_at = time.monotonic()
+        self.__timeframe = self.__configured_timeframe
 
     def __timeframe_passed(self):
-        return self.__started_at + self.__timeframe < self.__unix_now_in_seconds()
+        return self.__started_at + self.__timeframe <= time.monotonic()
 
     def __check__timeframe(self):
-        if self.__started_at == 0 or self.__timeframe_passed():
+        if self.__started_at is None or self.__timeframe_passed():
             self.__reset()
 
     def get_seconds_until_next_tf(self):
-        seconds_until_next_tf = int(self.__timeframe - (time.time() - self.__started_at))
+        seconds_until_next_tf = int(self.get_seconds_until_next_slot())
 
         return seconds_until_next_tf if seconds_until_next_tf > 0 else 1
 
+    def get_seconds_until_next_slot(self) -> float:
+        """
+        Returns precise number of seconds until the current timeframe ends
+        """
+        if self.__started_at is None:
+            return 0
+
+        return max(self.__started_at + self.__timeframe - time.monotonic(), 0)
+
     def check(self):
         # if request_allowed == -1, then there's no rate limit
         if self.__requests_allowed == -1:
@@ -89,3 +118,101 @@ class RateLimiter():
                 f"Rate limit reached: {self.to_dict()}\n\tCurrent timeframe ends in {seconds_until_next_tf} seconds",
                 seconds_until_next_tf
             )
+
+    def __get_seconds_blocked(self) -> float:
+        if self.__blocked_until is None:
+            return 0
+
+        seconds_blocked = self.__blocked_until - time.monotonic()
+        if seconds_blocked <= 0:
+            self.__blocked_until = None
+
+            return 0
+
+        return seconds_blocked
+
+    async def block_for(self, seconds: float):
+        """
+        No requests are allowed for the next seconds
+        """
+        blocked_until = time.monotonic() + seconds
+        if self.__blocked_until is None or self.__blocked_until < blocked_until:
+            self.__blocked_until = blocked_until
+
+    async def sync_with_vendor(
+        self,
+        requests_remaining: Optional[int], seconds_until_reset: Optional[float] = None,
+        requests_allowed: Optional[int] = None
+    ):
+        """
+        Adjusts budget & end of the current timeframe to the ones reported by vendor.
+        Responses may come out of order (fan-out, prefetch), so the spent budget is only raised within the timeframe
+        """
+        # without timeframe there's nothing to adjust, only to wait if vendor says so
+        if self.__requests_allowed == -1:
+            if requests_remaining == 0 and seconds_until_reset:
+                await self.block_for(seconds_until_reset)
+
+            return
+
+        if requests_allowed:
+            self.__requests_allowed = requests_allowed
+
+        self.__check__timeframe()
+
+        if seconds_until_reset is not None and seconds_until_reset > 0:
+            # vendor's window may end earlier or later (e.g. it's longer) than the configured one
+            self.__timeframe = time.monotonic() + seconds_until_reset - self.__started_at
+
+        if requests_remaining is not None:
+            self.__requests_done = max(self.__requests_done, self.__requests_allowed - requests_remaining)
+
+    def __reserve(self) -> float:
+        """
+        Takes a slot if there is one,
+        otherwise returns seconds until the slot frees up
+        """
+        seconds_blocked = self.__get_seconds_blocked()
+        if seconds_blocked > 0:
+            return seconds_blocked
+
+        # if request_allowed == -1, then there's no rate limit
+        if self.__requests_allowed == -1:
+            return 0
+
+        self.__check__timeframe()
+
+        if self.__requests_done < self.__requests_allowed:
+            self.__requests_done += 1
+
+            return 0
+
+        return self.get_seconds_until_next_slot()
+
+    def __get_lock(self) -> asyncio.Lock:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+
+        return self.__lock
+
+    async def acquire(self):
+        """
+        Waits till the request is allowed.
+
+        Waiters are served in FIFO order: the first one holds the lock
+        while sleeping, the rest are queued behind it
+        """
+        # if request_allowed == -1, then there's no rate limit
+        if self.__requests_allowed == -1 and not self.__get_seconds_blocked():
+            return
+
+        async with self.__get_lock():
+            while True:
+                seconds_until_next_slot = self.__reserve()
+                if seconds_until_next_slot <= 0:
+                    return
+
+                await asyncio.sleep(seconds_until_next_slot)
+
+    async def close(self):
+        return
@@ -0,0 +1,268 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from ...db.redis import get_db, get_async_db
+from .rate_limiter import RateLimitMissingAttributeException, RateLimitLimitReachedException
+
+
+# GCRA (generic cell rate algorithm) executed atomically inside Redis.
+# The key keeps TAT (theoretical arrival time, in ms) of the next request,
+# Redis' own clock is used so that all the workers share the same time source.
+#
+# Returns 0 if request is allowed, otherwise ms until it will be allowed
+GCRA_SCRIPT = """
+local emission_interval = tonumber(ARGV[1])
+local burst_tolerance = tonumber(ARGV[2])
+
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local allowed_at = tat - burst_tolerance
+if now < allowed_at then
+    return math.ceil(allowed_at - now)
+end
+
+local new_tat = tat + emission_interval
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now) + 1)
+
+return 0
+"""
+
+# moves TAT so, that the next request is allowed not earlier than in ARGV[1] ms
+BLOCK_SCRIPT = """
+local block_ms = tonumber(ARGV[1])
+local burst_tolerance = tonumber(ARGV[2])
+
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
+
+local blocked_tat = now + block_ms + burst_tolerance
+local tat = tonumber(redis.call('GET', KEYS[1]) or 0)
+if tat < blocked_tat then
+    redis.call('SET', KEYS[1], blocked_tat, 'PX', math.ceil(blocked_tat - now) + 1)
+end
+
+return 0
+"""
+
+
+# raises TAT to now + ARGV[1] ms, if vendor's own counter says more is spent.
+# TAT is never lowered, as a late response must not free slots, other workers have reserved since
+SYNC_SCRIPT = """
+local spent_ms = tonumber(ARGV[1])
+
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
+
+local current_tat = tonumber(redis.call('GET', KEYS[1]) or 0)
+local tat = math.max(current_tat, now + spent_ms)
+redis.call('SET', KEYS[1], tat, 'PX', math.ceil(tat - now) + 1)
+
+return 0
+"""
+
+
+class RedisRateLimiter():
+    """
+    Rate limiter shared by all the workers,
+    state is kept in Redis under `rate_limit:{vendor_name}` key
+    """
+
+    def __init__(
+        self,
+        vendor_name: str,
+        requests_allowed: int, timeframe: int = 0,
+    ):
+        self.__vendor_name = vendor_name
+
+        self.__requests_allowed = requests_allowed
+        self.__timeframe = timeframe
+        # timeframe may be the vendor's one till its window ends (monotonic), then it's back to this one
+        self.__configured_timeframe = timeframe
+        self.__vendor_window_ends_at: Optional[float] = None
+
+        self.__validate()
+
+        self.__db = None
+        self.__script = None
+
+        self.__async_db = None
+        self.__async_script = None
+        self.__async_block_script = None
+        self.__async_sync_script = None
+        self.__lock: Optional[asyncio.Lock] = None
+
+        # there's no TAT without rate limit, so the block is kept by the worker only
+        self.__blocked_until: Optional[float] = None
+
+    def __validate(self):
+        if not self.__vendor_name:
+            raise RateLimitMissingAttributeException("vendor_name")
+
+        if not self.__requests_allowed:
+            raise RateLimitMissingAttributeException("requests_allowed")
+
+        # requests_allowed == -1 means there's no rate limit
+        if self.__requests_allowed != -1 and not self.__timeframe:
+            raise RateLimitMissingAttributeException("timeframe")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "vendor_name": self.__vendor_name,
+            "storage": "redis",
+
+            "requests_allowed": self.__requests_allowed,
+            "timeframe": self.__configured_timeframe,
+        }
+
+    def _get_key(self) -> str:
+        return f"rate_limit:{self.__vendor_name}"
+
+    def __get_timeframe(self) -> float:
+        if self.__vendor_window_ends_at is not None and self.__vendor_window_ends_at <= time.monotonic():
+            self.__timeframe = self.__configured_timeframe
+            self.__vendor_window_ends_at = None
+
+        return self.__timeframe
+
+    def __get_emission_interval_ms(self) -> float:
+        return self.__get_timeframe() * 1000 / self.__requests_allowed
+
+    def __get_burst_tolerance_ms(self) -> float:
+        # allows the whole budget to be spent at once, as the local limiter does
+        return self.__get_timeframe() * 1000 - self.__get_emission_interval_ms()
+
+    def __get_script(self):
+        if self.__script is None:
+            self.__db = get_db()
+            self.__script = self.__db.register_script(GCRA_SCRIPT)
+
+        return self.__script
+
+    def __get_async_script(self):
+        if self.__async_script is None:
+            self.__async_db = get_async_db()
+            self.__async_script = self.__async_db.register_script(GCRA_SCRIPT)
+
+        return self.__async_script
+
+    def __get_lock(self) -> asyncio.Lock:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+
+        return self.__lock
+
+    def __get_script_args(self):
+        return [self.__get_emission_interval_ms(), self.__get_burst_tolerance_ms()]
+
+    def check(self):
+        # if request_allowed == -1, then there's no rate limit
+        if self.__requests_allowed == -1:
+            return
+
+        ms_until_allowed = self.__get_script()(
+            keys=[self._get_key()],
+            args=self.__get_script_args()
+        )
+        if ms_until_allowed > 0:
+            seconds_until_allowed = int(ms_until_allowed) / 1000
+            raise RateLimitLimitReachedException(
+                f"Rate limit reached: {self.to_dict()}\n\tNext request allowed in {seconds_until_allowed} seconds",
+                seconds_until_allowed
+            )
+
+    async def block_for(self, seconds: float):
+        """
+        No requests are allowed for the next seconds, for all the workers
+        """
+        if self.__requests_allowed == -1:
+            blocked_until = time.monotonic() + seconds
+            if self.__blocked_until is None or self.__blocked_until < blocked_until:
+                self.__blocked_until = blocked_until
+
+            return
+
+        if self.__async_block_script is None:
+            self.__get_async_script()
+            self.__async_block_script = self.__async_db.register_script(BLOCK_SCRIPT)
+
+        await self.__async_block_script(
+            keys=[self._get_key()],
+            args=[int(seconds * 1000), self.__get_burst_tolerance_ms()]
+        )
+
+    async def sync_with_vendor(
+        self,
+        requests_remaining: Optional[int], seconds_until_reset: Optional[float] = None,
+        requests_allowed: Optional[int] = None
+    ):
+        """
+        Adjusts the shared budget to the one reported by vendor.
+        requests_allowed & vendor's window (if its reset is further than timeframe, till the reset)
+        are applied to this worker only, the others learn them from their own responses
+        """
+        if requests_remaining == 0 or self.__requests_allowed == -1:
+            if requests_remaining == 0 and seconds_until_reset:
+                await self.block_for(seconds_until_reset)
+
+            return
+
+        if requests_allowed:
+            self.__requests_allowed = requests_allowed
+
+        if seconds_until_reset is not None and seconds_until_reset > self.__get_timeframe():
+            self.__timeframe = seconds_until_reset
+            self.__vendor_window_ends_at = time.monotonic() + seconds_until_reset
+
+        if requests_remaining is None:
+            return
+
+        if self.__async_sync_script is None:
+            self.__get_async_script()
+            self.__async_sync_script = self.__async_db.register_script(SYNC_SCRIPT)
+
+        # TAT of a budget with requests_remaining requests left
+        spent = self.__requests_allowed - min(requests_remaining, self.__requests_allowed)
+        await self.__async_sync_script(
+            keys=[self._get_key()],
+            args=[spent * self.__get_emission_interval_ms()]
+        )
+
+    async def acquire(self):
+        """
+        Waits till the request is allowed.
+
+        Waiters of the same worker are served in FIFO order,
+        between the workers it's the first one to hit Redis after the slot frees up
+        """
+        # if request_allowed == -1, then there's no rate limit
+        if self.__requests_allowed == -1:
+            if self.__blocked_until is not None and self.__blocked_until > time.monotonic():
+                await asyncio.sleep(self.__blocked_until - time.monotonic())
+
+            return
+
+        async with self.__get_lock():
+            while True:
+                ms_until_allowed = await self.__get_async_script()(
+                    keys=[self._get_key()],
+                    args=self.__get_script_args()
+                )
+                if ms_until_allowed <= 0:
+                    return
+
+                await asyncio.sleep(int(ms_until_allowed) / 1000)
+
+    async def close(self):
+        if self.__async_db is not None:
+            await self.__async_db.aclose()
+            self.__async_db = None
+            self.__async_script = None
+            self.__async_block_script = None
+            self.__async_sync_script = None
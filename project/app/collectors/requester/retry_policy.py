@@ -0,0 +1,78 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+
+class RequestFailedException(Exception):
+    """
+    Request failed even after retries, pages after it are unknown,
+    so it must not be treated as the end of data
+    """
+
+    def __init__(self, message, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+
+        self.__status = status
+        self.__retry_after = retry_after
+
+    def status(self) -> Optional[int]:
+        """
+        Returns HTTP status, None if there was no response (e.g. connection error, timeout)
+        """
+        return self.__status
+
+    def retry_after(self) -> Optional[float]:
+        return self.__retry_after
+
+
+class RetryPolicy():
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 1, backoff_max: float = 30,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504)
+    ):
+        self.__max_attempts = max_attempts
+        self.__backoff_base = backoff_base
+        self.__backoff_max = backoff_max
+        self.__retry_statuses = frozenset(retry_statuses)
+
+    def should_retry(self, attempt: int, status: Optional[int]) -> bool:
+        """
+        Failures without response (status is None) are always worth retrying
+        """
+        if attempt >= self.__max_attempts:
+            return False
+
+        return status is None or status in self.__retry_statuses
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        Returns seconds to wait before the next attempt: exponential backoff with full jitter,
+        so workers failed at the same time don't retry at the same time
+        """
+        return random.uniform(0, min(self.__backoff_max, self.__backoff_base * 2 ** (attempt - 1)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Returns seconds from Retry-After header, which is either seconds or HTTP date
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
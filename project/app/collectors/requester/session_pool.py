@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import weakref
+from typing import Callable, Dict
+
+import aiohttp
+
+
+# aiohttp session is bound to the event loop it was created in,
+# so sessions are shared per event loop & key (vendor)
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, aiohttp.ClientSession]]" = weakref.WeakKeyDictionary()
+_sessions_lock = threading.Lock()
+
+
+def get_shared_session(key: str, create_session: Callable[[], aiohttp.ClientSession]) -> aiohttp.ClientSession:
+    """
+    Returns session shared by the requesters of the current event loop with the same key,
+    it's created with create_session() if there's none yet
+    """
+    loop = asyncio.get_running_loop()
+
+    with _sessions_lock:
+        sessions = _sessions.setdefault(loop, {})
+
+        session = sessions.get(key)
+        if session is None or session.closed:
+            session = create_session()
+            sessions[key] = session
+
+        return session
+
+
+async def close_shared_sessions():
+    """
+    Closes sessions of the current event loop
+    """
+    loop = asyncio.get_running_loop()
+
+    with _sessions_lock:
+        sessions = _sessions.pop(loop, {})
+
+    for session in sessions.values():
+        await session.close()
@@ -20,4 +20,4 @@ class TokenAuthRequester(BaseRequester):
             'token': self.__token
         })
 
-        self.authenticated = True
+        self._authenticated = True
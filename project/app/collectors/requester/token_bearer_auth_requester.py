@@ -20,4 +20,4 @@ class TokenBearerAuthRequester(BaseRequester):
             'Authorization': f'Bearer {self.__token}'
         })
 
-        self.authenticated = True
+        self._authenticated = True
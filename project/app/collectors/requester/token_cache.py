@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from ...db import serialization
+from ...db.redis import get_shared_async_db
+
+# seconds before expiry the token is refreshed in background, requests keep using the current one meanwhile,
+# at most half of the token's lifetime
+REFRESH_AHEAD = 60
+
+# lifetime of the token, when token endpoint doesn't return expires_in
+DEFAULT_EXPIRES_IN = 300
+
+# fetches a new token, returns access_token & expires_in (seconds)
+FetchToken = Callable[[], Awaitable[Tuple[str, Optional[float]]]]
+
+# deletes the token, unless it was refreshed already
+INVALIDATE_TOKEN_SCRIPT = """
+local token = redis.call('GET', KEYS[1])
+if token and cjson.decode(token)['access_token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+
+return 0
+"""
+
+
+def get_token_key(key: str) -> str:
+    return f"auth_token:{key}"
+
+
+class TokenCache():
+    """
+    Access tokens shared by all the requesters of the worker process,
+    with use_redis=True by all the workers.
+
+    Token is refreshed in background, once it's less than refresh_ahead seconds
+    (or half of its lifetime, if it's shorter) from expiry, concurrent refreshes of the same token (within an event loop) share a single token request
+    """
+
+    def __init__(self, refresh_ahead: float = REFRESH_AHEAD):
+        self.__refresh_ahead = refresh_ahead
+
+        # key -> (access_token, expires_at, refresh_at timestamps)
+        self.__tokens: Dict[str, Tuple[str, float, float]] = {}
+        self.__lock = threading.Lock()
+
+        # tasks are bound to the event loop they were created in, so refreshes are tracked per loop
+        self.__refreshes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+    async def get_token(self, key: str, fetch_token: FetchToken, use_redis: bool = False) -> str:
+        token = self.__get_cached(key)
+        if token is None and use_redis:
+            token = await self.__get_from_redis(key)
+
+        if token is None or token[1] <= time.time():
+            return await self.__refresh(key, fetch_token, use_redis)
+
+        access_token, _, refresh_at = token
+        if refresh_at <= time.time():
+            self.__start_refresh(key, fetch_token, use_redis)
+
+        return access_token
+
+    async def invalidate(self, key: str, access_token: str, use_redis: bool = False):
+        """
+        Drops the token, e.g. when the vendor rejected it before expiry.
+        Token is kept if it isn't access_token anymore, i.e. it's refreshed already
+        """
+        with self.__lock:
+            token = self.__tokens.get(key)
+            if token is not None and token[0] == access_token:
+                del self.__tokens[key]
+
+        if use_redis:
+            await get_shared_async_db().register_script(INVALIDATE_TOKEN_SCRIPT)(
+                keys=[get_token_key(key)], args=[access_token]
+            )
+
+    def __get_cached(self, key: str) -> Optional[Tuple[str, float, float]]:
+        with self.__lock:
+            return self.__tokens.get(key)
+
+    def __set_cached(self, key: str, access_token: str, expires_at: float, refresh_at: float):
+        with self.__lock:
+            self.__tokens[key] = (access_token, expires_at, refresh_at)
+
+    async def __get_from_redis(self, key: str) -> Optional[Tuple[str, float, float]]:
+        data = await get_shared_async_db().get(get_token_key(key))
+        if data is None:
+            return None
+
+        token = serialization.loads(data)
+        self.__set_cached(key, token['access_token'], token['expires_at'], token['refresh_at'])
+
+        return token['access_token'], token['expires_at'], token['refresh_at']
+
+    def __start_refresh(self, key: str, fetch_token: FetchToken, use_redis: bool) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+
+        with self.__lock:
+            refreshes = self.__refreshes.setdefault(loop, {})
+
+            task = refreshes.get(key)
+            if task is None:
+                task = loop.create_task(self.__fetch(key, fetch_token, use_redis))
+                refreshes[key] = task
+                task.add_done_callback(lambda t: self.__finish_refresh(refreshes, key, t))
+
+            return task
+
+    def __finish_refresh(self, refreshes: Dict[str, asyncio.Task], key: str, task: asyncio.Task):
+        with self.__lock:
+            if refreshes.get(key) is task:
+                del refreshes[key]
+
+        # background refresh failure isn't fatal, the token is fetched again on expiry
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Failed to refresh token {key}: {task.exception()}")
+
+    async def __refresh(self, key: str, fetch_token: FetchToken, use_redis: bool) -> str:
+        # shielded, so a cancelled job doesn't cancel the refresh other jobs are waiting for
+        return await asyncio.shield(self.__start_refresh(key, fetch_token, use_redis))
+
+    async def __fetch(self, key: str, fetch_token: FetchToken, use_redis: bool) -> str:
+        access_token, expires_in = await fetch_token()
+        expires_in = float(expires_in or DEFAULT_EXPIRES_IN)
+
+        # short-lived token would be refreshed on every request otherwise
+        expires_at = time.time() + expires_in
+        refresh_at = expires_at - min(self.__refresh_ahead, expires_in / 2)
+        self.__set_cached(key, access_token, expires_at, refresh_at)
+
+        if use_redis:
+            await get_shared_async_db().set(
+                get_token_key(key),
+                serialization.dumps({'access_token': access_token, 'expires_at': expires_at, 'refresh_at': refresh_at}),
+                px=max(int(expires_in * 1000), 1)
+            )
+
+        return access_token
+
+
+# shared by all the requesters of the worker process
+token_cache = TokenCache()
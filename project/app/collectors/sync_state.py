@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from ..db import serialization
+from ..db.redis import get_db, get_async_db
+
+
+# watermarks of runs, which never finished, are dropped after it
+RUN_WATERMARKS_TTL = 7 * 24 * 60 * 60
+
+# a run, which wasn't resumed within it, starts from scratch
+CHECKPOINT_TTL = 24 * 60 * 60
+
+# takes the lease if it's free, or prolongs it if it's held by the same lease_id
+ACQUIRE_LEASE_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if holder == false or holder == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+
+return 0
+"""
+
+
+class LeaseLostException(Exception):
+    """
+    Vendor's lease was taken by another run, or expired before it was prolonged,
+    the job has to stop, as the vendor might be synced by another run already
+    """
+
+
+def get_sync_key(vendor_name: str, name: str) -> str:
+    return f"sync:{vendor_name}:{name}"
+
+
+def is_vendor_running(vendor_name: str) -> bool:
+    """
+    Returns True if some job holds the vendor's lease, usable outside of event loop (e.g. by the scheduler)
+    """
+    return get_db().exists(get_sync_key(vendor_name, "lease")) > 0
+
+
+class SyncState():
+    """
+    Per vendor sync state shared by all the workers, kept in Redis under `sync:{vendor_name}:*` keys.
+
+    Checkpoint is the position of the vendor's current run (request params of the next page, rate limit data & run's data),
+    the next run resumes from it if the current one was interrupted.
+
+    Lease makes sure there is only one run of the vendor at a time,
+    it's held by all the jobs of the run & expires if none of them prolongs it (e.g. worker died).
+
+    Watermark is the max last_seen of the fetched entities (unix time),
+    it's collected per run & committed only when the run is finished,
+    so an interrupted run never moves it forward.
+    """
+
+    def __init__(self, vendor_name: str):
+        self.__vendor_name = vendor_name
+        self.__db = None
+
+    def _get_key(self, name: str) -> str:
+        return get_sync_key(self.__vendor_name, name)
+
+    def __get_db(self):
+        if self.__db is None:
+            self.__db = get_async_db()
+
+        return self.__db
+
+    async def acquire_lease(self, lease_id: str, ttl: int) -> bool:
+        """
+        Returns False if the lease is held by another lease_id, ttl is in seconds
+        """
+        acquire = self.__get_db().register_script(ACQUIRE_LEASE_SCRIPT)
+
+        return await acquire(keys=[self._get_key("lease")], args=[lease_id, int(ttl * 1000)]) == 1
+
+    async def release_lease(self, lease_id: str):
+        release = self.__get_db().register_script(RELEASE_LEASE_SCRIPT)
+
+        await release(keys=[self._get_key("lease")], args=[lease_id])
+
+    async def get_watermark(self) -> Optional[datetime]:
+        watermark = await self.__get_db().get(self._get_key("watermark"))
+
+        return datetime.fromtimestamp(float(watermark), timezone.utc) if watermark is not None else None
+
+    async def get_last_full_sync_at(self) -> Optional[datetime]:
+        full_sync_at = await self.__get_db().get(self._get_key("full_sync_at"))
+
+        return datetime.fromtimestamp(float(full_sync_at), timezone.utc) if full_sync_at is not None else None
+
+    async def raise_run_watermark(self, run_id: str, watermark: datetime):
+        # sorted set keeps the max per run, the score is updated only if it grows
+        db = self.__get_db()
+
+        await db.zadd(self._get_key("run_watermarks"), {run_id: watermark.timestamp()}, gt=True)
+        await db.expire(self._get_key("run_watermarks"), RUN_WATERMARKS_TTL)
+
+    async def commit_run(self, run_id: str, is_full_sync: bool):
+        """
+        Moves run's watermark to the vendor's one
+        """
+        db = self.__get_db()
+
+        run_watermark = await db.zscore(self._get_key("run_watermarks"), run_id)
+        if run_watermark is not None:
+            watermark = await db.get(self._get_key("watermark"))
+            if watermark is None or float(watermark) < run_watermark:
+                await db.set(self._get_key("watermark"), run_watermark)
+
+        await db.zrem(self._get_key("run_watermarks"), run_id)
+
+        if is_full_sync:
+            await db.set(self._get_key("full_sync_at"), datetime.now(timezone.utc).timestamp())
+
+    async def get_checkpoint(self) -> Optional[Dict[str, Any]]:
+        checkpoint = await self.__get_db().get(self._get_key("checkpoint"))
+
+        return serialization.loads(checkpoint) if checkpoint is not None else None
+
+    async def save_checkpoint(self, checkpoint: Dict[str, Any]):
+        """
+        Saves position of the run, everything before it is in DB already
+        """
+        checkpoint = {
+            **checkpoint,
+            "updated_at": datetime.now(timezone.utc).timestamp(),
+        }
+
+        await self.__get_db().set(self._get_key("checkpoint"), serialization.dumps(checkpoint), ex=CHECKPOINT_TTL)
+
+    async def clear_checkpoint(self):
+        await self.__get_db().delete(self._get_key("checkpoint"))
+
+    async def close(self):
+        if self.__db is not None:
+            await self.__db.aclose()
+            self.__db = None
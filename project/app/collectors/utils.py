@@ -41,7 +41,9 @@ def read_yaml(filepath: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
         raise ValueError(f"Failed to parse YAML file: {e}")
 
 
-def create_collector(collector_type: str, rate_limit_data: Dict[str, Any] = None) -> BaseCollector:
+def create_collector(
+    collector_type: str, rate_limit_data: Dict[str, Any] = None, sync_data: Dict[str, Any] = None
+) -> BaseCollector:
     collector_file = VENDORS_PATH / collector_type / 'collector.py'
     config_file = VENDORS_PATH / collector_type / 'config.yaml'
 
@@ -77,7 +79,7 @@ def create_collector(collector_type: str, rate_limit_data: Dict[str, Any] = None
 
         return None
 
-    return CollectorClass(config, rate_limit_data)
+    return CollectorClass(config, rate_limit_data, sync_data)
 
 
 def load_all_collectors() -> List[BaseCollector]:
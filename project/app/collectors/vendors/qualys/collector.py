@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from ...base_collector import BaseCollector
 from ...hydrated import BaseHydratedCollection, HydratedHostsCollection, HydratedHost
@@ -11,14 +11,22 @@ class Collector(BaseCollector):
             'skip': data['offset'],
         }
 
-    def _paginate(self, request_params: Dict, raw_data: Dict) -> Optional[Dict]:
-        hosts_collection = self._hydrate(raw_data)
-        if hosts_collection.len() < request_params['limit']:
+    def _get_request_offset(self, request_params: Dict) -> Optional[int]:
+        return request_params['skip']
+
+    def _paginate(self, request_params: Dict, raw_data: Dict, hydrated_collection: BaseHydratedCollection) -> Optional[Dict]:
+        if hydrated_collection.len() < request_params['limit']:
             return None
 
         request_params['skip'] += request_params['limit']
         return request_params
 
+    def _supports_streamed_pages(self) -> bool:
+        return True
+
+    def _get_volatile_raw_fields(self) -> Tuple[str, ...]:
+        return ('sourceInfo.list.Ec2AssetSourceSimple.lastUpdated',)
+
     def _hydrate(self, raw_data: Dict) -> BaseHydratedCollection:
         hostsList = []
         for raw_host in raw_data:
@@ -32,12 +40,14 @@ class Collector(BaseCollector):
                 self._normalize_dt(self.__get_first_seen(raw_host)),
                 self._normalize_dt(self.__get_last_seen(raw_host)),
 
-                raw_host
+                raw_host,
+                self._get_volatile_raw_fields()
             ))
 
         return HydratedHostsCollection(
             hostsList,
-            self._get_dedup_before_insert()
+            self._get_dedup_before_insert(),
+            self._get_skip_unchanged()
         )
 
     def __get_mac_addr(self, raw_data: Dict) -> str:
@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
 
 from ...base_collector import BaseCollector
 from ...hydrated import BaseHydratedCollection, HydratedHostsCollection, HydratedHost
@@ -14,7 +14,7 @@ class Collector(BaseCollector):
             'cursor': cursor_param,
         }
 
-    def _paginate(self, request_params, raw_data: Optional[Dict] = None) -> Optional[Dict]:
+    def _paginate(self, request_params: Dict, raw_data: Dict, hydrated_collection: BaseHydratedCollection) -> Optional[Dict]:
         if not len(raw_data.get('hosts')):
             return None
 
@@ -26,6 +26,9 @@ class Collector(BaseCollector):
             'cursor': cursor_param
         }
 
+    def _get_volatile_raw_fields(self) -> Tuple[str, ...]:
+        return ('last_observed',)
+
     def _hydrate(self, raw_data: Dict) -> BaseHydratedCollection:
         hostsList = []
         for raw_host in raw_data.get('hosts', []):
@@ -39,12 +42,14 @@ class Collector(BaseCollector):
                 self._normalize_dt(self.__get_first_seen(raw_host)),
                 self._normalize_dt(self.__get_last_seen(raw_host)),
 
-                raw_host
+                raw_host,
+                self._get_volatile_raw_fields()
             ))
 
         return HydratedHostsCollection(
             hostsList,
-            self._get_dedup_before_insert()
+            self._get_dedup_before_insert(),
+            self._get_skip_unchanged()
         )
 
     def __get_ip(self, raw_data: Dict[str, Any]) -> str:
@@ -1,12 +1,32 @@
+import asyncio
+import threading
 import traceback
+import uuid
 from asgiref.sync import async_to_sync
-from typing import Dict, Any
+from celery.signals import worker_init, worker_shutdown
+from typing import Dict, Any, List, Optional
 
+from ..db import serialization
 from ..db.celery import get_app
+from ..db.async_mongo import close_db_client, close_all_db_clients
+from ..db.indexes import setup_indexes
+from ..db.mongo import get_db_conn
+from ..db.redis import close_shared_async_db
+from .hydration_pool import shutdown_hydration_executor
+from .sync_state import LeaseLostException
+from .requester.session_pool import close_shared_sessions
 from .utils import create_collector, read_yaml
 
-worker_concurrency = read_yaml().get('worker_concurrency', 1)
-print(f"Starting Celery app with worker_concurrency={worker_concurrency}")
+worker_config = read_yaml()
+worker_concurrency = worker_config.get('worker_concurrency', 1)
+# persistent - every worker thread runs its tasks in its own long-lived event loop,
+# so db clients & http sessions bound to the loop are reused by the next tasks
+# per_task - every task runs in a new event loop
+worker_event_loop = worker_config.get('worker_event_loop', 'per_task')
+print(
+    f"Starting Celery app with worker_concurrency={worker_concurrency}, worker_event_loop={worker_event_loop}, "
+    f"json backend={serialization.get_backend_name()}"
+)
 
 celery_app = get_app()
 celery_app.conf.update(
@@ -14,16 +34,75 @@ celery_app.conf.update(
     worker_concurrency=worker_concurrency
 )
 
+_thread_local = threading.local()
+_worker_loops: List[asyncio.AbstractEventLoop] = []
+_worker_loops_lock = threading.Lock()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns event loop of the current worker thread, it's created on the first call
+    """
+    loop = getattr(_thread_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_local.loop = loop
+
+        with _worker_loops_lock:
+            _worker_loops.append(loop)
+
+    return loop
+
+
+def close_worker_loops():
+    """
+    Closes http sessions & event loops of all the worker threads, loops must not be running
+    """
+    with _worker_loops_lock:
+        loops = list(_worker_loops)
+        _worker_loops.clear()
+
+    for loop in loops:
+        if loop.is_closed() or loop.is_running():
+            continue
+
+        loop.run_until_complete(close_shared_sessions())
+        loop.run_until_complete(close_shared_async_db())
+        loop.close()
+
 
 class JobData():
-    def __init__(self, rate_limit_data: Dict[str, Any] = None, request_params: Dict[str, Any] = None):
+    def __init__(
+        self, rate_limit_data: Dict[str, Any] = None, request_params: Dict[str, Any] = None,
+        sync_data: Dict[str, Any] = None, lease_id: str = None
+    ):
         self.rate_limit_data = rate_limit_data
         self.request_params = request_params
+        self.sync_data = sync_data
+        self.lease_id = lease_id
 
     def to_dict(self):
         return self.__dict__
 
 
+async def _run_sync(collector_instance, request_params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns request params of the next page, None if the whole run is done
+    """
+    # new job resumes the vendor's interrupted run, if there is one
+    request_params = await collector_instance.start_sync(request_params)
+
+    # fetches as many pages as job's budget allows,
+    # the rest is continued by the next job
+    next_page_params = await collector_instance.fetch_pages(request_params)
+
+    if next_page_params is None:
+        # the whole run is done
+        await collector_instance.finish_sync()
+
+    return next_page_params
+
+
 async def async_run_job(collector_type: str, job_data_dict: Dict[str, Any] = None):
     # including with lazy to avoid dependency chain
     from .register_jobs import register_job
@@ -33,21 +112,53 @@ async def async_run_job(collector_type: str, job_data_dict: Dict[str, Any] = Non
     print(f"Found job: {collector_type} with {job_data.to_dict()}, starting async")
 
     try:
-        collector_instance = create_collector(collector_type, job_data.rate_limit_data)
+        collector_instance = create_collector(collector_type, job_data.rate_limit_data, job_data.sync_data)
+
+        # only one run of the vendor at a time, all the jobs of the run share its lease
+        if job_data.lease_id is None:
+            job_data.lease_id = uuid.uuid4().hex
+
+        if not await collector_instance.acquire_lease(job_data.lease_id):
+            print(f"\t{collector_type} is being run by another job, skipping")
+            await collector_instance.close()
+
+            return
+
         print("\tRunning collector")
+        sync = asyncio.create_task(_run_sync(collector_instance, job_data.request_params))
+        lease_keeper = asyncio.create_task(collector_instance.keep_lease(job_data.lease_id))
 
+        next_page_params = None
         try:
-            next_page_params = await collector_instance.fetch_data(job_data.request_params)
+            await asyncio.wait({sync, lease_keeper}, return_when=asyncio.FIRST_COMPLETED)
+            if not sync.done():
+                # lease is lost, the vendor may be synced by another run already
+                sync.cancel()
+                await asyncio.gather(sync, return_exceptions=True)
+                lease_keeper.result()
+
+            next_page_params = sync.result()
             print(f"\t\tNext page params: {next_page_params}")
+        except LeaseLostException as e:
+            print(f"Stopped fetching data from collector: {e}")
         except Exception as e:
             print(f"Failed to fetch data from collector: {e}")
+        finally:
+            for task in (sync, lease_keeper):
+                task.cancel()
+            await asyncio.gather(sync, lease_keeper, return_exceptions=True)
+
+        if next_page_params is None:
+            # the run is done, or failed & will be resumed from its checkpoint by the next scheduled job
+            await collector_instance.release_lease(job_data.lease_id)
 
         print("\t\t\tClosing http session")
-        await collector_instance.close_requester_session()
+        await collector_instance.close()
 
         if next_page_params is not None:
             job_data.request_params = next_page_params
             job_data.rate_limit_data = collector_instance.get_rate_limiter_data()
+            job_data.sync_data = collector_instance.get_sync_data()
 
             register_job(collector_type, job_data)
 
@@ -56,6 +167,31 @@ async def async_run_job(collector_type: str, job_data_dict: Dict[str, Any] = Non
         traceback.print_exc()
 
 
+async def async_run_job_in_new_loop(collector_type: str, job_data_dict: Dict[str, Any] = None):
+    try:
+        await async_run_job(collector_type, job_data_dict)
+    finally:
+        # the event loop is gone after the task, so are the db client & the sessions bound to it
+        await close_shared_sessions()
+        await close_shared_async_db()
+        close_db_client()
+
+
+@worker_init.connect
+def on_worker_init(**kwargs):
+    setup_indexes(get_db_conn())
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    close_worker_loops()
+    close_all_db_clients()
+    shutdown_hydration_executor()
+
+
 @celery_app.task
 def run_job(collector_type: str, job_data_dict: Dict[str, Any] = None):
-    return async_to_sync(async_run_job)(collector_type, job_data_dict)
+    if worker_event_loop == 'persistent':
+        return get_worker_loop().run_until_complete(async_run_job(collector_type, job_data_dict))
+
+    return async_to_sync(async_run_job_in_new_loop)(collector_type, job_data_dict)
@@ -1,10 +1,24 @@
 from typing import Optional
 from celery import Celery
+from kombu.serialization import register
+
+from .serialization import dumps, loads, CELERY_SERIALIZER, CELERY_CONTENT_TYPE
+
+register(CELERY_SERIALIZER, dumps, loads, content_type=CELERY_CONTENT_TYPE, content_encoding='utf-8')
 
 
 def get_app(db_name: Optional[str] = None) -> Celery:
     """
     Returns a Celery app instance connected to Redis as the broker.
     The optional `db_name` defaul value is `collector_tasks`
+
+    Tasks are serialized with app.db.serialization (orjson if installed),
+    plain json is still accepted for the messages queued before
     """
-    return Celery('collector_tasks', broker='redis://data_collectors_redis:6379/0')
+    app = Celery('collector_tasks', broker='redis://data_collectors_redis:6379/0')
+    app.conf.update(
+        task_serializer=CELERY_SERIALIZER,
+        accept_content=[CELERY_SERIALIZER, 'json']
+    )
+
+    return app
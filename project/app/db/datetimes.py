@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from dateutil import parser
+from functools import lru_cache
+from typing import Optional
+
+
+# Formats fromisoformat() misses, tried before falling back to (slow) dateutil parser:
+# before python 3.11 it accepts fractions of 3 or 6 digits only, e.g. not `2023-07-25T19:10:00.12Z`
+KNOWN_DT_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M:%S.%f",
+)
+
+
+def fix_dt_for_db(dt_str: str) -> Optional[datetime]:
+    try:
+        return _parse_dt_cached(dt_str)
+    except TypeError:
+        # unhashable value, can't be cached
+        return _parse_dt(dt_str)
+
+
+# hosts of the same page often share timestamps
+@lru_cache(maxsize=4096)
+def _parse_dt_cached(dt_str: str) -> Optional[datetime]:
+    return _parse_dt(dt_str)
+
+
+def _parse_dt(dt_str: str) -> Optional[datetime]:
+    try:
+        dt = _parse_known_dt_formats(dt_str)
+        if dt is None:
+            dt = parser.parse(dt_str)
+
+        if dt.tzinfo:
+            dt = dt.astimezone(timezone.utc)
+        else:
+            dt = dt.replace(tzinfo=timezone.utc)
+
+        return dt
+
+    except (ValueError, TypeError, OverflowError) as e:
+        print(f"Failed to parse datetime string: {dt_str} — {e}")
+        return None
+
+
+def _parse_known_dt_formats(dt_str: str) -> Optional[datetime]:
+    if not isinstance(dt_str, str):
+        return None
+
+    # fromisoformat() doesn't support `Z` suffix before python 3.11
+    dt_str = dt_str[:-1] + "+00:00" if dt_str.endswith("Z") else dt_str
+
+    try:
+        return datetime.fromisoformat(dt_str)
+    except ValueError:
+        pass
+
+    for dt_format in KNOWN_DT_FORMATS:
+        try:
+            return datetime.strptime(dt_str, dt_format)
+        except ValueError:
+            continue
+
+    return None
@@ -0,0 +1,122 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel, database
+from pymongo.errors import OperationFailure, PyMongoError
+from typing import Dict, List, Optional, Any, Tuple
+
+
+# unique_id backs every upsert & dedup lookup of the collectors,
+# the rest back the front's filters, sorting & grouping
+HOSTS_DISCOVERED_INDEXES = [
+    IndexModel([("unique_id", ASCENDING)], name="unique_id_unique", unique=True),
+    IndexModel([("source", ASCENDING), ("last_seen", DESCENDING)], name="source_last_seen"),
+    IndexModel([("ip", ASCENDING), ("mac", ASCENDING)], name="ip_mac"),
+    IndexModel([("mac", ASCENDING)], name="mac"),
+    IndexModel([("last_seen", DESCENDING)], name="last_seen"),
+    IndexModel([("first_seen", ASCENDING)], name="first_seen"),
+]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "hostsDiscovered": HOSTS_DISCOVERED_INDEXES,
+}
+
+# not a part of index's definition, so indexes differing only in them are the same
+IGNORED_INDEX_OPTIONS = {"key", "name", "v", "ns", "background"}
+
+# (key, options) of an index
+IndexSpec = Tuple[Tuple[Tuple[str, Any], ...], Dict[str, Any]]
+
+
+def ensure_indexes(db: database.Database) -> Dict[str, Dict[str, Any]]:
+    """
+    Creates missing indexes, existing ones are left untouched, so it's safe to run on every startup.
+    Index exists if there is one with the same key & options, whatever its name is.
+
+    Returns report per collection:
+        created - indexes created by this call
+        failed - indexes failed to be created (e.g. duplicated unique_id values)
+        unknown - existing indexes, which are not declared in INDEXES
+        unused - declared indexes with no usage since Mongo's start, None if $indexStats is not permitted
+    """
+    report = {}
+    for collection_name, index_models in INDEXES.items():
+        collection = db[collection_name]
+
+        existing_specs = {
+            name: _get_index_spec(info) for name, info in collection.index_information().items()
+        }
+
+        created = []
+        failed = []
+        # declared name => name of the index in DB
+        found_names = {}
+        for index_model in index_models:
+            name = index_model.document["name"]
+
+            existing_name = _find_index(existing_specs, _get_index_spec(index_model.document))
+            if existing_name is not None:
+                found_names[name] = existing_name
+                continue
+
+            try:
+                collection.create_indexes([index_model])
+                created.append(name)
+                found_names[name] = name
+            except PyMongoError as e:
+                print(f"Failed to create index {collection_name}.{name}: {e}")
+                failed.append(name)
+
+        report[collection_name] = {
+            "created": created,
+            "failed": failed,
+            "unknown": sorted(set(existing_specs) - set(found_names.values()) - {"_id_"}),
+            "unused": _get_unused_indexes(collection, list(found_names.values())),
+        }
+
+    return report
+
+
+def _get_index_spec(index: Dict[str, Any]) -> IndexSpec:
+    """
+    Returns (key, options) of the index declared by IndexModel.document or found by index_information()
+    """
+    # directions are compared by value, Mongo may return 1.0 for 1
+    key = tuple(dict(index["key"]).items())
+    options = {option: value for option, value in index.items() if option not in IGNORED_INDEX_OPTIONS}
+
+    return key, options
+
+
+def _find_index(existing_specs: Dict[str, IndexSpec], spec: IndexSpec) -> Optional[str]:
+    for name, existing_spec in existing_specs.items():
+        if existing_spec == spec:
+            return name
+
+    return None
+
+
+def _get_unused_indexes(collection, index_names: List[str]) -> Optional[List[str]]:
+    try:
+        index_stats = list(collection.aggregate([{"$indexStats": {}}]))
+    except OperationFailure:
+        # indexStats action is not granted to readWrite role
+        return None
+
+    used_names = {stat["name"] for stat in index_stats if stat.get("accesses", {}).get("ops", 0) > 0}
+
+    return [name for name in index_names if name not in used_names]
+
+
+def print_indexes_report(report: Dict[str, Dict[str, Any]]):
+    for collection_name, collection_report in report.items():
+        print(f"Indexes of {collection_name}:")
+        for key, names in collection_report.items():
+            print(f"\t{key}: {names if names is not None else 'n/a'}")
+
+
+def setup_indexes(db: database.Database):
+    """
+    Ensures indexes on app's startup, failure doesn't stop the app
+    """
+    try:
+        print_indexes_report(ensure_indexes(db))
+    except PyMongoError as e:
+        print(f"Failed to ensure indexes: {e}")
@@ -1,9 +1,9 @@
-from datetime import datetime, timezone
-from dateutil import parser
 from pymongo import MongoClient, database
-from typing import Optional
 import os
 
+# parsing is shared by the sync & async packages, so neither of them imports the other
+from .datetimes import fix_dt_for_db
+
 
 def get_db_client() -> MongoClient:
     dbName = os.environ.get("MONGO_DB_NAME")
@@ -18,19 +18,3 @@ def get_db_client() -> MongoClient:
 
 def get_db_conn() -> database.Database:
     return get_db_client().get_database()
-
-
-def fix_dt_for_db(dt_str: str) -> Optional[datetime]:
-    try:
-        dt = parser.parse(dt_str)
-
-        if dt.tzinfo:
-            dt = dt.astimezone(timezone.utc)
-        else:
-            dt = dt.replace(tzinfo=timezone.utc)
-
-        return dt
-
-    except (ValueError, TypeError) as e:
-        print(f"Failed to parse datetime string: {dt_str} — {e}")
-        return None
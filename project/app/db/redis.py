@@ -1,5 +1,48 @@
+import asyncio
+import threading
+import weakref
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+
+# async client is bound to the event loop it was first used in,
+# so shared clients are kept per event loop (within the process)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncRedis]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
 
 
 def get_db() -> Redis:
     return Redis(host="data_collectors_redis", port=6379, db=0)
+
+
+def get_async_db() -> AsyncRedis:
+    return AsyncRedis(host="data_collectors_redis", port=6379, db=0)
+
+
+def get_shared_async_db() -> AsyncRedis:
+    """
+    Returns client shared by everything running in the current event loop,
+    it's closed by close_shared_async_db()
+    """
+    loop = asyncio.get_running_loop()
+
+    with _async_clients_lock:
+        db = _async_clients.get(loop)
+        if db is None:
+            db = get_async_db()
+            _async_clients[loop] = db
+
+        return db
+
+
+async def close_shared_async_db():
+    """
+    Closes client of the current event loop
+    """
+    loop = asyncio.get_running_loop()
+
+    with _async_clients_lock:
+        db = _async_clients.pop(loop, None)
+
+    if db is not None:
+        await db.aclose()
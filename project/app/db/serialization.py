@@ -0,0 +1,50 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Union
+from uuid import UUID
+
+# orjson is optional, stdlib json is used without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# content type of Celery messages serialized with dumps()
+CELERY_SERIALIZER = 'fast_json'
+CELERY_CONTENT_TYPE = 'application/x-fast-json'
+
+
+def get_backend_name() -> str:
+    return 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj: Any) -> Any:
+    """
+    Serializes types, which are not JSON native, the same way with both backends
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+
+    if isinstance(obj, (Decimal, UUID)):
+        return str(obj)
+
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    return json.dumps(obj, default=_default)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+
+    return json.loads(data)
@@ -2,6 +2,8 @@ from flask import Flask, render_template, request
 import os
 
 from .queries import _get_raw_data, _get_grouped_data
+from ..db.indexes import setup_indexes
+from ..db.mongo import get_db_conn
 
 
 app = Flask(__name__)
@@ -22,4 +24,9 @@ def index():
 
 if __name__ == "__main__":
     port = os.environ.get("FRONT_PORT")
+
+    # once, not in the reloader's child process as well
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        setup_indexes(get_db_conn())
+
     app.run(debug=True, host="0.0.0.0", port=port)
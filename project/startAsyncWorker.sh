@@ -0,0 +1,3 @@
+#!/bin/bash
+
+python -u -m app.collectors.async_worker
@@ -118,3 +118,12 @@ def test_collector_instantiation(vendor_dir):
         _ = CollectorClass(config)
     except Exception as e:
         pytest.fail(f"{vendor_dir.name}: Collector instantiation failed: {e}")
+
+
+def test_streaming_is_rejected_for_collectors_paginating_by_raw_data():
+    from app.collectors.vendors.tenable.collector import Collector as TenableCollector
+
+    with pytest.raises(ValueError) as exc:
+        TenableCollector({"vendor_name": "tenable", "stream_items_path": "hosts.item"})
+
+    assert "stream_items_path" in str(exc.value)
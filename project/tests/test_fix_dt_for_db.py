@@ -0,0 +1,29 @@
+import pytest
+from datetime import datetime, timezone, timedelta
+
+from app.db.async_mongo import fix_dt_for_db
+
+
+@pytest.mark.parametrize("dt_str, expected", [
+    ("2023-07-25T19:10:00Z", datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc)),
+    ("2023-07-25T19:10:00.123Z", datetime(2023, 7, 25, 19, 10, 0, 123000, tzinfo=timezone.utc)),
+    ("2023-07-25T19:10:00.123456Z", datetime(2023, 7, 25, 19, 10, 0, 123456, tzinfo=timezone.utc)),
+    ("2023-07-25T21:10:00+02:00", datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc)),
+    ("2023-07-25 19:10:00", datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc)),
+    # not an iso format, handled by dateutil fallback
+    ("Jul 25 2023 19:10:00 UTC", datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc)),
+])
+def test_fix_dt_for_db_formats(dt_str, expected):
+    dt = fix_dt_for_db(dt_str)
+
+    assert dt == expected
+    assert dt.utcoffset() == timedelta(0)
+
+
+@pytest.mark.parametrize("dt_str", [None, "", "not a date", {"$date": "2023-07-25T19:10:00Z"}])
+def test_fix_dt_for_db_invalid(dt_str):
+    assert fix_dt_for_db(dt_str) is None
+
+
+def test_fix_dt_for_db_is_cached():
+    assert fix_dt_for_db("2023-07-25T19:10:00Z") is fix_dt_for_db("2023-07-25T19:10:00Z")
@@ -0,0 +1,350 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+
+from app.collectors.hydrated import HydratedHost, HydratedHostsCollection
+from app.collectors.hydrated.host.collection import fingerprints_cache
+from app.collectors.hydrated.write_buffer import WriteBuffer, WriteBufferFlushException
+from app.collectors.vendors.crowdstrike.collector import Collector as CrowdstrikeCollector
+from app.collectors.vendors.qualys.collector import Collector as QualysCollector
+
+
+def _create_host(raw_data=None, ip="127.0.0.1", last_seen=datetime(2023, 7, 25, 20, 15, tzinfo=timezone.utc)):
+    return HydratedHost(
+        "test",
+        ip, "12:5e:2e:db:58:aa",
+        "linux", "ubuntu", "tst1",
+        datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc),
+        last_seen,
+        raw_data if raw_data is not None else {"hostname": "tst1"}
+    )
+
+
+class _NoDbHostsCollection(HydratedHostsCollection):
+    def __init__(self, entities, existing_unique_ids=None, stored_fingerprints=None):
+        super().__init__(entities, True, True)
+
+        self.__existing_unique_ids = existing_unique_ids or []
+        self.__stored_fingerprints = stored_fingerprints or {}
+
+    async def _get_existing_unique_ids_from_db(self):
+        return set(self.__existing_unique_ids)
+
+    async def _get_stored_fingerprints_from_db(self, unique_ids):
+        return {
+            unique_id: self.__stored_fingerprints[unique_id]
+            for unique_id in unique_ids if unique_id in self.__stored_fingerprints
+        }
+
+
+def test_host_is_slotted():
+    host = _create_host()
+
+    assert not hasattr(host, "__dict__")
+
+
+def test_host_to_dict_has_all_fields():
+    host_dict = _create_host().to_dict()
+
+    assert set(host_dict.keys()) == {
+        "unique_id", "source", "ip", "mac", "os", "os_version", "name", "first_seen", "last_seen",
+        "raw_data", "fingerprint"
+    }
+    assert host_dict["raw_data"] == {"hostname": "tst1"}
+
+
+def test_host_to_dict_sanitizes_raw_data_only():
+    host = _create_host({
+        "hostname": "$tst1",
+        "seen": [datetime(2023, 7, 25, 19, 10)],
+    })
+    host_dict = host.to_dict()
+
+    assert host_dict["raw_data"] == {"hostname": "_tst1", "seen": ["2023-07-25T19:10:00Z"]}
+    assert host_dict["first_seen"] == datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc)
+
+
+def test_host_to_dict_does_not_mutate_entity():
+    host = _create_host({"hostname": "$tst1"})
+
+    first_dict = host.to_dict()
+    first_dict["name"] = "changed"
+
+    assert host.to_dict()["name"] == "tst1"
+    assert host.raw_data == {"hostname": "$tst1"}
+
+
+def test_host_missing_required_field():
+    with pytest.raises(ValueError) as exc:
+        HydratedHost("test", None, "mac", "linux", "ubuntu", "tst1", None, None, {})
+    assert "ip" in str(exc.value)
+
+
+def test_collection_collapses_duplicates_keeping_latest():
+    older = _create_host({"v": "older"}, last_seen=datetime(2023, 7, 25, tzinfo=timezone.utc))
+    newer = _create_host({"v": "newer"}, last_seen=datetime(2023, 7, 26, tzinfo=timezone.utc))
+    other = _create_host(ip="127.0.0.2")
+
+    collection = HydratedHostsCollection([newer, other, older])
+    collection._collapse_duplicates()
+
+    assert collection.len() == 2
+    assert collection._entities[0] is newer
+    assert collection._entities[1] is other
+
+
+def test_collection_dedup_splits_new_and_existing():
+    existing = _create_host(ip="127.0.0.1")
+    new = _create_host(ip="127.0.0.2")
+
+    collection = _NoDbHostsCollection([existing, new], [existing.unique_id])
+    asyncio.run(collection._dedup())
+
+    assert collection._entities == [new]
+    assert collection._dup_entities == [existing]
+
+
+def test_host_fingerprint_ignores_last_seen():
+    host = _create_host(last_seen=datetime(2023, 7, 25, tzinfo=timezone.utc))
+    same_host_later = _create_host(last_seen=datetime(2023, 7, 26, tzinfo=timezone.utc))
+    changed_host = _create_host({"hostname": "changed"})
+
+    assert host.get_fingerprint() == same_host_later.get_fingerprint()
+    assert host.get_fingerprint() != changed_host.get_fingerprint()
+
+
+def _vendor_host(collector_class, raw_data, last_seen):
+    # hook doesn't depend on the collector's config
+    volatile_raw_fields = object.__new__(collector_class)._get_volatile_raw_fields()
+
+    return HydratedHost(
+        "test",
+        "127.0.0.1", "12:5e:2e:db:58:aa",
+        "linux", "ubuntu", "tst1",
+        datetime(2023, 7, 25, 19, 10, tzinfo=timezone.utc),
+        last_seen,
+        raw_data,
+        volatile_raw_fields
+    )
+
+
+def test_host_fingerprint_ignores_vendor_last_seen():
+    def crowdstrike_host(last_seen, hostname="tst1"):
+        return _vendor_host(CrowdstrikeCollector, {
+            "hostname": hostname,
+            "external_ip": "127.0.0.1",
+            "first_seen": "2023-07-25T19:10:00Z",
+            "last_seen": last_seen.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }, last_seen)
+
+    def qualys_host(last_seen):
+        return _vendor_host(QualysCollector, {
+            "name": "tst1",
+            "sourceInfo": {"list": [{"Ec2AssetSourceSimple": {
+                "firstDiscovered": "2023-07-25T19:10:00Z",
+                "lastUpdated": last_seen.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }}]},
+        }, last_seen)
+
+    first_poll = datetime(2023, 7, 25, 20, 15, tzinfo=timezone.utc)
+    next_poll = datetime(2023, 7, 26, 20, 15, tzinfo=timezone.utc)
+
+    assert crowdstrike_host(first_poll).get_fingerprint() == crowdstrike_host(next_poll).get_fingerprint()
+    assert crowdstrike_host(first_poll).get_fingerprint() != crowdstrike_host(next_poll, "changed").get_fingerprint()
+    assert qualys_host(first_poll).get_fingerprint() == qualys_host(next_poll).get_fingerprint()
+
+    # raw_data itself is stored as is
+    assert "last_seen" in crowdstrike_host(next_poll).to_dict()["raw_data"]
+
+
+def test_collection_filters_unchanged_hosts():
+    fingerprints_cache.clear()
+
+    stored_last_seen = datetime(2023, 7, 25)  # naive, as returned by Mongo
+    unchanged_later = _create_host(ip="127.0.0.1", last_seen=datetime(2023, 7, 26, tzinfo=timezone.utc))
+    unchanged_same = _create_host(ip="127.0.0.2", last_seen=datetime(2023, 7, 25, tzinfo=timezone.utc))
+    changed = _create_host({"hostname": "changed"}, ip="127.0.0.3")
+    new = _create_host(ip="127.0.0.4")
+
+    collection = _NoDbHostsCollection([unchanged_later, unchanged_same, changed, new], stored_fingerprints={
+        unchanged_later.unique_id: (unchanged_later.get_fingerprint(), stored_last_seen),
+        unchanged_same.unique_id: (unchanged_same.get_fingerprint(), stored_last_seen),
+        changed.unique_id: (_create_host(ip="127.0.0.3").get_fingerprint(), stored_last_seen),
+    })
+    asyncio.run(collection._filter_unchanged())
+
+    assert collection._entities == [changed, new]
+    # only later last_seen has to be written
+    assert collection._unchanged_entities == [unchanged_later]
+
+
+def test_collection_confirms_cached_fingerprints_in_db():
+    fingerprints_cache.clear()
+
+    stored_last_seen = datetime(2023, 7, 25)
+    host = _create_host(last_seen=datetime(2023, 7, 26, tzinfo=timezone.utc))
+    cached_changed = _create_host({"hostname": "changed"}, ip="127.0.0.2")
+
+    # written by this worker once, but changed in DB since then (e.g. by another worker)
+    fingerprints_cache.set(host.unique_id, host.get_fingerprint(), stored_last_seen)
+    fingerprints_cache.set(cached_changed.unique_id, _create_host(ip="127.0.0.2").get_fingerprint(), stored_last_seen)
+
+    looked_up = []
+
+    class _LookupsHostsCollection(_NoDbHostsCollection):
+        async def _get_stored_fingerprints_from_db(self, unique_ids):
+            looked_up.extend(unique_ids)
+
+            return await super()._get_stored_fingerprints_from_db(unique_ids)
+
+    collection = _LookupsHostsCollection([host, cached_changed], stored_fingerprints={
+        host.unique_id: ("other fingerprint", stored_last_seen),
+    })
+    asyncio.run(collection._filter_unchanged())
+
+    assert collection._entities == [cached_changed, host]
+    assert collection._unchanged_entities == []
+    # changed since cached, so isn't looked up
+    assert looked_up == [host.unique_id]
+
+
+def test_collection_watermark_is_max_last_seen():
+    latest = _create_host(ip="127.0.0.1", last_seen=datetime(2023, 7, 26, tzinfo=timezone.utc))
+    collection = HydratedHostsCollection([
+        _create_host(ip="127.0.0.2", last_seen=datetime(2023, 7, 25, tzinfo=timezone.utc)),
+        latest,
+    ])
+
+    assert collection.get_watermark() == latest.last_seen
+    assert HydratedHostsCollection([]).get_watermark() is None
+
+
+class _FakeDbCollection():
+    full_name = "testDB.hostsDiscovered"
+
+    def __init__(self):
+        self.bulk_writes = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes.append((list(operations), ordered))
+
+
+def test_write_buffer_flushes_when_full():
+    db_collection = _FakeDbCollection()
+    write_buffer = WriteBuffer(3)
+
+    async def add_pages():
+        await write_buffer.add(db_collection, ["op1", "op2"], ["id1", "id2"])
+        assert write_buffer.has_pending(["id2"])
+        assert db_collection.bulk_writes == []
+
+        await write_buffer.add(db_collection, ["op3"], ["id3"])
+
+    asyncio.run(add_pages())
+
+    assert db_collection.bulk_writes == [(["op1", "op2", "op3"], False)]
+    assert write_buffer.len() == 0
+    assert not write_buffer.has_pending(["id2"])
+
+
+def test_write_buffer_flush_writes_the_rest():
+    db_collection = _FakeDbCollection()
+    write_buffer = WriteBuffer(100)
+
+    async def add_and_flush():
+        await write_buffer.add(db_collection, ["op1"], ["id1"])
+        await write_buffer.flush()
+        await write_buffer.flush()
+
+    asyncio.run(add_and_flush())
+
+    assert db_collection.bulk_writes == [(["op1"], False)]
+
+
+def test_write_buffer_calls_on_flushed_after_write_only():
+    class _FailingDbCollection(_FakeDbCollection):
+        full_name = "test.failing"
+
+        async def bulk_write(self, operations, ordered=True):
+            raise BulkWriteError({"writeErrors": []})
+
+    db_collection = _FakeDbCollection()
+    write_buffer = WriteBuffer(100)
+    flushed = []
+
+    async def add_and_flush():
+        await write_buffer.add(db_collection, ["op1"], ["id1"], lambda: flushed.append("id1"))
+        assert flushed == []
+
+        await write_buffer.flush()
+
+        await write_buffer.add(_FailingDbCollection(), ["op2"], ["id2"], lambda: flushed.append("id2"))
+        with pytest.raises(RuntimeError):
+            await write_buffer.flush()
+
+    asyncio.run(add_and_flush())
+
+    assert flushed == ["id1"]
+
+
+def test_write_buffer_flushes_all_collections_when_one_fails():
+    class _FailingDbCollection(_FakeDbCollection):
+        full_name = "test.failing"
+
+        async def bulk_write(self, operations, ordered=True):
+            raise BulkWriteError({"writeErrors": [{"errmsg": "failed"}]})
+
+    failing = _FailingDbCollection()
+    db_collection = _FakeDbCollection()
+    write_buffer = WriteBuffer(100)
+    flushed = []
+
+    async def add_and_flush():
+        await write_buffer.add(failing, ["op1"], ["id1"], lambda: flushed.append("id1"))
+        await write_buffer.add(db_collection, ["op2"], ["id2"], lambda: flushed.append("id2"))
+
+        with pytest.raises(WriteBufferFlushException) as exc_info:
+            await write_buffer.flush()
+
+        return exc_info.value
+
+    err = asyncio.run(add_and_flush())
+
+    assert list(err.failures) == ["test.failing"]
+    assert "failed" in str(err)
+    assert db_collection.bulk_writes == [(["op2"], False)]
+    assert flushed == ["id2"]
+
+
+def test_collection_does_not_cache_fingerprint_of_older_host():
+    fingerprints_cache.clear()
+
+    stored = _create_host(last_seen=datetime(2023, 7, 26, tzinfo=timezone.utc))
+    older = _create_host({"hostname": "older"}, last_seen=datetime(2023, 7, 25, tzinfo=timezone.utc))
+    later = _create_host({"hostname": "later"}, last_seen=datetime(2023, 7, 27, tzinfo=timezone.utc))
+
+    class _FakeWriteBuffer():
+        def has_pending(self, unique_ids):
+            return False
+
+        async def add(self, db_collection, operations, unique_ids=(), on_flushed=None):
+            on_flushed()
+
+    async def save(host):
+        collection = _NoDbHostsCollection([host], existing_unique_ids=[host.unique_id], stored_fingerprints={
+            stored.unique_id: (stored.get_fingerprint(), datetime(2023, 7, 26)),
+        })
+        collection._create_db_conn = lambda: None
+        collection.use_write_buffer(_FakeWriteBuffer())
+
+        await collection.save_to_db()
+
+    # upsert keeps the stored raw_data, so does the cache
+    asyncio.run(save(older))
+    assert fingerprints_cache.get_many([stored.unique_id]) == {}
+
+    asyncio.run(save(later))
+    assert fingerprints_cache.get_many([stored.unique_id]) == {
+        stored.unique_id: (later.get_fingerprint(), later.last_seen)
+    }
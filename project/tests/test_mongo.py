@@ -1,9 +1,11 @@
 import pytest
 from pymongo import UpdateOne
 from pymongo.errors import PyMongoError
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
+from app.db.datetimes import KNOWN_DT_FORMATS
 from app.db.mongo import get_db_client, get_db_conn, fix_dt_for_db
+from app.db.indexes import ensure_indexes
 
 
 @pytest.fixture(scope="module")
@@ -39,6 +41,26 @@ def test_db_connection():
         client.close()
 
 
+# samples fromisoformat() of python 3.10 misses, per format of KNOWN_DT_FORMATS
+KNOWN_DT_FORMATS_SAMPLES = {
+    "%Y-%m-%dT%H:%M:%S.%f%z": "2023-07-25T19:10:00.12Z",
+    "%Y-%m-%d %H:%M:%S.%f": "2023-07-25 19:10:00.12",
+}
+
+
+def test_known_dt_formats_have_samples():
+    assert set(KNOWN_DT_FORMATS_SAMPLES) == set(KNOWN_DT_FORMATS)
+
+
+@pytest.mark.parametrize("dt_format", KNOWN_DT_FORMATS)
+def test_fix_dt_for_db_parses_known_dt_format(dt_format):
+    dt_str = KNOWN_DT_FORMATS_SAMPLES[dt_format]
+
+    assert datetime.strptime(dt_str.replace("Z", "+00:00"), dt_format).replace(tzinfo=timezone.utc) \
+        == datetime(2023, 7, 25, 19, 10, 0, 120000, tzinfo=timezone.utc)
+    assert fix_dt_for_db(dt_str) == datetime(2023, 7, 25, 19, 10, 0, 120000, tzinfo=timezone.utc)
+
+
 def test_insert_single_document(db):
     doc = {
         "unique_id": "tst_uniqid_1",
@@ -198,3 +220,29 @@ def test_read_multiple_documents_after_bulk_insert_update_by_date(db):
     assert fetched_by_id["tst_uniqid_3"]["name"] == "tst3 updated"
     assert fetched_by_id["tst_uniqid_3"]["first_seen"].strftime("%Y-%m-%dT%H:%M:%SZ") == "2023-07-24T19:10:20Z"
     assert fetched_by_id["tst_uniqid_3"]["last_seen"].strftime("%Y-%m-%dT%H:%M:%SZ") == "2023-07-26T20:15:20Z"
+
+
+def test_ensure_indexes_is_idempotent(db):
+    ensure_indexes(get_db_conn())
+    report = ensure_indexes(get_db_conn())
+
+    assert report["hostsDiscovered"]["created"] == []
+    assert report["hostsDiscovered"]["failed"] == []
+    assert db.index_information()["unique_id_unique"]["unique"] is True
+
+
+def test_ensure_indexes_matches_existing_index_by_key(db):
+    ensure_indexes(get_db_conn())
+    db.drop_index("first_seen")
+    db.create_index([("first_seen", 1)], name="first_seen_renamed")
+
+    try:
+        report = ensure_indexes(get_db_conn())
+
+        assert report["hostsDiscovered"]["created"] == []
+        assert report["hostsDiscovered"]["failed"] == []
+        assert "first_seen_renamed" not in report["hostsDiscovered"]["unknown"]
+        assert "first_seen" not in db.index_information()
+    finally:
+        db.drop_index("first_seen_renamed")
+        ensure_indexes(get_db_conn())
@@ -1,5 +1,9 @@
+import asyncio
+import time
 import pytest
 from app.collectors.requester.rate_limiter import RateLimitMissingAttributeException, RateLimitLimitReachedException, RateLimiter
+from app.collectors.requester.redis_rate_limiter import RedisRateLimiter
+from app.db.redis import get_db
 
 
 def test_rate_limiter_initialization_valid():
@@ -52,3 +56,164 @@ def test_rate_limiter_resets_after_timeframe():
         rl.check()  # 2nd call, should raise
 
     rl.check()  # Should reset and pass
+
+
+def test_rate_limiter_acquire_waits_precisely():
+    rl = RateLimiter("test_vendor", 2, 0.3)
+
+    async def acquire_three():
+        started = time.monotonic()
+        for _ in range(3):
+            await rl.acquire()
+
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(acquire_three())
+
+    # 3rd request waits for the timeframe end only, not for the whole rounded second
+    assert 0.25 <= elapsed < 0.6
+
+
+def test_rate_limiter_acquire_serves_waiters_in_order():
+    rl = RateLimiter("test_vendor", 1, 0.1)
+    served = []
+
+    async def waiter(i):
+        await rl.acquire()
+        served.append(i)
+
+    async def run_waiters():
+        await asyncio.gather(*(waiter(i) for i in range(4)))
+
+    asyncio.run(run_waiters())
+
+    assert served == [0, 1, 2, 3]
+
+
+def test_rate_limiter_state_survives_to_dict():
+    rl = RateLimiter("test_vendor", 2, 10)
+    rl.check()
+    rl.check()
+
+    restored = RateLimiter(**rl.to_dict())
+    with pytest.raises(RateLimitLimitReachedException):
+        restored.check()
+
+
+def test_rate_limiter_block_for_delays_acquire():
+    rl = RateLimiter("test_vendor", -1)
+
+    async def blocked_acquire():
+        await rl.block_for(0.2)
+
+        started = time.monotonic()
+        await rl.acquire()
+
+        return time.monotonic() - started
+
+    assert 0.15 <= asyncio.run(blocked_acquire()) < 0.5
+
+
+def test_rate_limiter_syncs_budget_with_vendor():
+    rl = RateLimiter("test_vendor", 2, 10)
+
+    async def synced_acquires():
+        await rl.sync_with_vendor(5, 10, 10)
+        for _ in range(5):
+            await rl.acquire()
+
+        await rl.sync_with_vendor(0, 0.2)
+
+        started = time.monotonic()
+        await rl.acquire()
+
+        return time.monotonic() - started
+
+    # vendor allows 5 more requests right away, then none till its reset in 0.2 seconds
+    assert 0.15 <= asyncio.run(synced_acquires()) < 0.5
+    assert rl.to_dict()["requests_allowed"] == 10
+
+
+def test_redis_rate_limiter_missing_timeframe():
+    with pytest.raises(RateLimitMissingAttributeException) as exc:
+        RedisRateLimiter("test_vendor", 5, 0)
+    assert "timeframe" in str(exc.value)
+
+
+def test_redis_rate_limiter_respects_limit():
+    rl = RedisRateLimiter("pytest_redis_vendor", 2, 10)
+    get_db().delete(rl._get_key())
+
+    rl.check()
+    rl.check()
+
+    with pytest.raises(RateLimitLimitReachedException) as exc:
+        rl.check()  # 3rd call, should raise
+
+    assert exc.value.seconds_until_next_timeframe() > 0
+
+    get_db().delete(rl._get_key())
+
+
+def test_redis_rate_limiter_is_shared_between_instances():
+    rl1 = RedisRateLimiter("pytest_redis_vendor", 2, 10)
+    rl2 = RedisRateLimiter("pytest_redis_vendor", 2, 10)
+    get_db().delete(rl1._get_key())
+
+    rl1.check()
+    rl2.check()
+
+    with pytest.raises(RateLimitLimitReachedException):
+        rl1.check()  # budget was spent by both instances
+
+    get_db().delete(rl1._get_key())
+
+
+def test_rate_limiter_adopts_longer_vendor_window():
+    rl = RateLimiter("test_vendor", 2, 0.1)
+
+    async def synced_acquires():
+        # vendor's window ends in 0.3 seconds, configured timeframe is shorter
+        await rl.sync_with_vendor(1, 0.3, 2)
+        await rl.acquire()
+
+        started = time.monotonic()
+        await rl.acquire()
+
+        return time.monotonic() - started
+
+    assert 0.25 <= asyncio.run(synced_acquires()) < 0.6
+    assert rl.to_dict()["timeframe"] == 0.1
+
+
+def test_rate_limiter_restores_timeframe_after_vendor_window():
+    rl = RateLimiter("test_vendor", 1, 0.1)
+
+    async def synced_acquires():
+        await rl.sync_with_vendor(0, 0.3)
+        # waits for vendor's reset, the next window is the configured one
+        await rl.acquire()
+
+        started = time.monotonic()
+        await rl.acquire()
+
+        return time.monotonic() - started
+
+    assert asyncio.run(synced_acquires()) < 0.2
+
+
+def test_rate_limiter_ignores_older_vendor_budget():
+    rl = RateLimiter("test_vendor", 5, 10)
+
+    async def synced_acquires():
+        await rl.sync_with_vendor(1, 0.3)
+        # response to an earlier request comes last
+        await rl.sync_with_vendor(4, 0.3)
+        await rl.acquire()
+
+        started = time.monotonic()
+        await rl.acquire()
+
+        return time.monotonic() - started
+
+    assert 0.25 <= asyncio.run(synced_acquires()) < 0.6
@@ -0,0 +1,192 @@
+import asyncio
+import pytest
+import time
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.collectors.requester import BasicAuthRequester, HttpConfig, NoAuthRequester, RetryPolicy, RequestFailedException
+from app.collectors.requester.rate_limit_headers import RateLimitHeaders
+from app.collectors.requester.retry_policy import parse_retry_after
+
+
+def test_parse_retry_after_seconds_and_date():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_retry_policy_backoff_is_capped():
+    policy = RetryPolicy(max_attempts=10, backoff_base=1, backoff_max=5)
+
+    assert all(0 <= policy.get_backoff(attempt) <= 5 for attempt in range(1, 10))
+
+
+def test_retry_policy_retries_transient_failures_only():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.should_retry(1, 503)
+    assert policy.should_retry(1, None)
+    assert not policy.should_retry(1, 404)
+    assert not policy.should_retry(3, 503)
+
+
+async def _request_with_responses(statuses, retry_policy, headers=None):
+    """
+    Serves statuses one by one (the last one is repeated), returns result & number of requests
+    """
+    calls = []
+
+    async def handler(request):
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(status)
+
+        return web.json_response({"status": status}, status=status, headers=headers if status >= 400 else None)
+
+    app = web.Application()
+    app.router.add_get("/hosts", handler)
+
+    async with TestServer(app) as server:
+        requester = NoAuthRequester(str(server.make_url("")), "json", 5, {
+            "vendor_name": "test_vendor",
+            "requests_allowed": -1,
+        })
+        requester.set_retry_policy(retry_policy)
+
+        try:
+            return await requester.request("hosts"), len(calls)
+        finally:
+            await requester.close_session()
+
+
+def test_request_retries_transient_failure():
+    result, calls = asyncio.run(_request_with_responses(
+        [502, 503, 200], RetryPolicy(max_attempts=3, backoff_base=0.01)
+    ))
+
+    assert result == {"status": 200}
+    assert calls == 3
+
+
+def test_request_raises_when_retries_are_exhausted():
+    with pytest.raises(RequestFailedException) as exc:
+        asyncio.run(_request_with_responses([503], RetryPolicy(max_attempts=2, backoff_base=0.01)))
+
+    assert exc.value.status() == 503
+
+
+def test_request_honors_retry_after():
+    async def timed_request():
+        started = asyncio.get_running_loop().time()
+        result = await _request_with_responses(
+            [429, 200], RetryPolicy(max_attempts=2, backoff_base=0), {"Retry-After": "1"}
+        )
+
+        return result, asyncio.get_running_loop().time() - started
+
+    (result, calls), elapsed = asyncio.run(timed_request())
+
+    assert result == {"status": 200}
+    assert elapsed >= 0.9
+
+
+def test_rate_limit_headers_parse():
+    headers = RateLimitHeaders("X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-RetryAfter", "epoch")
+
+    limit, remaining, seconds_until_reset = headers.parse({
+        "X-RateLimit-Limit": "6000",
+        "X-RateLimit-Remaining": "5999",
+        "X-RateLimit-RetryAfter": str(time.time() + 60),
+    })
+
+    assert (limit, remaining) == (6000, 5999)
+    assert 55 < seconds_until_reset <= 60
+    assert RateLimitHeaders().parse({"X-RateLimit-Limit": "6000"}) == (None, None, None)
+
+
+def test_request_stream_yields_items():
+    pytest.importorskip("ijson")
+
+    async def handler(request):
+        return web.json_response([{"id": i, "score": 0.5} for i in range(3)])
+
+    async def stream_items():
+        app = web.Application()
+        app.router.add_get("/hosts", handler)
+
+        async with TestServer(app) as server:
+            requester = NoAuthRequester(str(server.make_url("")), "json", 5, {
+                "vendor_name": "test_vendor",
+                "requests_allowed": -1,
+            })
+
+            try:
+                return [item async for item in requester.request_stream("hosts", items_path="item")]
+            finally:
+                await requester.close_session()
+
+    assert asyncio.run(stream_items()) == [{"id": i, "score": 0.5} for i in range(3)]
+
+
+def test_basic_auth_header_is_sent():
+    async def handler(request):
+        return web.json_response({"authorization": request.headers.get("Authorization")})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/hosts", handler)
+
+        async with TestServer(app) as server:
+            requester = BasicAuthRequester(str(server.make_url("")), "json", 5, {
+                "vendor_name": "test_vendor",
+                "requests_allowed": -1,
+            }, "user", "pass")
+
+            try:
+                return await requester.request("hosts")
+            finally:
+                await requester.close_session()
+
+    assert asyncio.run(run()) == {"authorization": "Basic dXNlcjpwYXNz"}
+
+
+def test_session_uses_http_config():
+    async def handler(request):
+        # compressed by the server, as the request accepts it
+        response = web.json_response({"accept_encoding": request.headers.get("Accept-Encoding")})
+        response.enable_compression()
+
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/hosts", handler)
+
+        async with TestServer(app) as server:
+            requester = NoAuthRequester(str(server.make_url("")), "json", 5, {
+                "vendor_name": "test_vendor",
+                "requests_allowed": -1,
+            })
+            requester.set_http_config(HttpConfig(limit_per_host=3, keepalive_timeout=30, read_timeout=2))
+
+            try:
+                result = await requester.request("hosts")
+                session = await requester._get_session()
+
+                return result, session.connector.limit_per_host, session.timeout
+            finally:
+                await requester.close_session()
+
+    result, limit_per_host, timeout = asyncio.run(run())
+
+    assert result["accept_encoding"].startswith("gzip, deflate")
+    assert limit_per_host == 3
+    assert timeout.total == 5 and timeout.sock_read == 2
+
+
+def test_http_config_without_compression():
+    assert HttpConfig(compression=False).get_headers() == {"Accept-Encoding": "identity"}
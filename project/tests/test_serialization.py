@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from kombu.serialization import dumps as kombu_dumps, loads as kombu_loads
+
+from app.db import serialization
+from app.db.celery import get_app
+
+
+def test_round_trip():
+    data = {"limit": 10, "skip": 20, "filter": "last_seen:>='2023-07-25T20:15:00Z'", "started_at": 1690316100.5}
+
+    assert serialization.loads(serialization.dumps(data)) == data
+    assert serialization.loads(serialization.dumps(data).encode('utf-8')) == data
+
+
+def test_non_json_types_are_serialized_as_strings():
+    dumped = serialization.loads(serialization.dumps({
+        "since": datetime(2023, 7, 25, 20, 15, tzinfo=timezone.utc),
+        "score": Decimal("0.5"),
+    }))
+
+    assert dumped == {"since": "2023-07-25T20:15:00+00:00", "score": "0.5"}
+
+
+def test_celery_uses_registered_serializer():
+    app = get_app()
+    assert app.conf.task_serializer == serialization.CELERY_SERIALIZER
+    assert "json" in app.conf.accept_content
+
+    content_type, content_encoding, payload = kombu_dumps(
+        [["crowdstrike", {"request_params": {"skip": 2}}], {}], serializer=serialization.CELERY_SERIALIZER
+    )
+
+    assert content_type == serialization.CELERY_CONTENT_TYPE
+    assert kombu_loads(payload, content_type, content_encoding) == [["crowdstrike", {"request_params": {"skip": 2}}], {}]
@@ -0,0 +1,165 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.collectors.requester import OAuthRequester
+from app.collectors.requester.token_cache import TokenCache
+
+
+class _TokenEndpoint():
+    def __init__(self, expires_in=3600, delay=0):
+        self.calls = 0
+        self.__expires_in = expires_in
+        self.__delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.__delay)
+
+        return f"token-{self.calls}", self.__expires_in
+
+
+def test_token_is_cached_until_expiry():
+    async def run():
+        cache = TokenCache(refresh_ahead=0)
+        fetch_token = _TokenEndpoint()
+
+        tokens = [await cache.get_token("vendor", fetch_token) for _ in range(3)]
+
+        return tokens, fetch_token.calls
+
+    tokens, calls = asyncio.run(run())
+
+    assert tokens == ["token-1"] * 3
+    assert calls == 1
+
+
+def test_concurrent_refreshes_share_token_request():
+    async def run():
+        cache = TokenCache()
+        fetch_token = _TokenEndpoint(delay=0.05)
+
+        tokens = await asyncio.gather(*[cache.get_token("vendor", fetch_token) for _ in range(10)])
+
+        return tokens, fetch_token.calls
+
+    tokens, calls = asyncio.run(run())
+
+    assert set(tokens) == {"token-1"}
+    assert calls == 1
+
+
+def test_token_is_refreshed_in_background_ahead_of_expiry():
+    async def run():
+        cache = TokenCache(refresh_ahead=60)
+        fetch_token = _TokenEndpoint(expires_in=0.2)
+
+        first = await cache.get_token("vendor", fetch_token)
+        # refreshed in the second half of its lifetime only, as it's shorter than refresh_ahead
+        await asyncio.sleep(0.12)
+        # close to expiry: current token is returned, the new one is fetched meanwhile
+        second = await cache.get_token("vendor", fetch_token)
+        await asyncio.sleep(0.01)
+        third = await cache.get_token("vendor", fetch_token)
+
+        return first, second, third
+
+    assert asyncio.run(run()) == ("token-1", "token-1", "token-2")
+
+
+def test_short_lived_token_is_not_refreshed_on_every_request():
+    async def run():
+        cache = TokenCache(refresh_ahead=60)
+        fetch_token = _TokenEndpoint(expires_in=30)
+
+        for _ in range(5):
+            await cache.get_token("vendor", fetch_token)
+            await asyncio.sleep(0)
+
+        return fetch_token.calls
+
+    assert asyncio.run(run()) == 1
+
+
+def test_invalidated_token_is_fetched_again():
+    async def run():
+        cache = TokenCache()
+        fetch_token = _TokenEndpoint()
+
+        await cache.get_token("vendor", fetch_token)
+        await cache.invalidate("vendor", "token-1")
+
+        return await cache.get_token("vendor", fetch_token)
+
+    assert asyncio.run(run()) == "token-2"
+
+
+def test_refreshed_token_is_not_invalidated_by_late_rejection():
+    async def run():
+        cache = TokenCache()
+        fetch_token = _TokenEndpoint()
+
+        await cache.get_token("vendor", fetch_token)
+        await cache.invalidate("vendor", "token-1")
+        await cache.get_token("vendor", fetch_token)
+
+        # 401 of a request sent with token-1 comes after token-2 is fetched
+        await cache.invalidate("vendor", "token-1")
+
+        return await cache.get_token("vendor", fetch_token), fetch_token.calls
+
+    assert asyncio.run(run()) == ("token-2", 2)
+
+
+async def _oauth_requests(requests_number, revoked_tokens=()):
+    """
+    Makes requests_number requests with separate requesters, returns results & number of token requests
+    """
+    token_calls = []
+
+    async def token_handler(request):
+        token_calls.append(await request.post())
+
+        return web.json_response({"access_token": f"token-{len(token_calls)}", "expires_in": 3600})
+
+    async def hosts_handler(request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token in revoked_tokens:
+            return web.json_response({}, status=401)
+
+        return web.json_response({"token": token})
+
+    app = web.Application()
+    app.router.add_post("/token", token_handler)
+    app.router.add_get("/hosts", hosts_handler)
+
+    async with TestServer(app) as server:
+        results = []
+        for _ in range(requests_number):
+            requester = OAuthRequester(
+                str(server.make_url("")), "json", 5,
+                {"vendor_name": "test_vendor", "requests_allowed": -1},
+                # server's port makes the token url unique, as the token cache is shared by the process
+                str(server.make_url("/token")), "client", "secret"
+            )
+
+            try:
+                results.append(await requester.request("hosts"))
+            finally:
+                await requester.close_session()
+
+    return results, len(token_calls)
+
+
+def test_oauth_token_is_shared_by_requesters():
+    results, token_calls = asyncio.run(_oauth_requests(3))
+
+    assert results == [{"token": "token-1"}] * 3
+    assert token_calls == 1
+
+
+def test_oauth_rejected_token_is_replaced():
+    results, token_calls = asyncio.run(_oauth_requests(2, revoked_tokens=("token-1",)))
+
+    assert results == [{"token": "token-2"}] * 2
+    assert token_calls == 2